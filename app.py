@@ -2,50 +2,37 @@ import streamlit as st
 import uuid
 import os
 from dotenv import load_dotenv
-from pipeline import MongoDBConnection, EmbeddingModelSentence, ModelResponse
-from sentence_transformers import SentenceTransformer
-from reflection import Reflection
-from google import genai
-# Use reflection to rewrite user query
-
-
-# Initialize the LLM client
+from chat_history import ChatHistory
+from resources import load_resources
+from tracing import tracer
 
 
 # Load environment variables
 load_dotenv("api.env")
 
-# Unique session ID
-session_id = str(uuid.uuid4())
-
 st.set_page_config(page_title="Steam Game Recommender", page_icon="🎮")
 st.title("🎮 Ask me for Any steam game!")
 
 # Initialize session state
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+# Bounded memory for the reflection/planner prompts; chat_history is only rendered
+if "history" not in st.session_state:
+    st.session_state.history = ChatHistory()
 
-# Load models and DB connection once
-@st.cache_resource
-def load_resources():
-    mongo_conn = MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))  # from .env
-    embedding_model = EmbeddingModelSentence(SentenceTransformer("all-MiniLM-L6-v2"))
-    model_response = ModelResponse(gemini_api_key=os.environ.get("gemini_api_key"))
-    return mongo_conn, embedding_model, model_response
-
-mongo_conn, embedding_model, model_response = load_resources()
-
-gemini_client = genai.Client(api_key=os.environ.get("gemini_api_key"))
+# Unique session ID
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+session_id = st.session_state.session_id
 
-# Initialize the Reflection object
-reflection = Reflection(gemini_client)
+# Models, DB connection, Gemini client, Reflection and planner load once per
+# process and are shared by every session and rerun
+@st.cache_resource
+def get_resources():
+    # micro_batch_window_ms > 0 merges concurrent sessions' query encodes into one forward pass
+    return load_resources(micro_batch_ms=float(os.environ.get("micro_batch_window_ms", 0)))
 
-# Example usage in app.py
-def process_user_query(chat_history,new_prompt):
-    # Use Reflection to rewrite the user query
-    new_prompt = reflection.get_standalone_query(chat_history,new_prompt)
-    print(new_prompt)
-    return new_prompt
+resources = get_resources()
 
 # Display chat history
 for msg in st.session_state.chat_history:
@@ -54,27 +41,33 @@ for msg in st.session_state.chat_history:
 
 # Chat input
 if prompt := st.chat_input("What kind of games are you looking for?"):
-    if st.session_state.chat_history:
-        print(st.session_state.chat_history)
-        # Process the user query with chat history
-        rewritten_prompt = process_user_query(st.session_state.chat_history, prompt)
-    else:
-        # Use the original prompt if no chat history
-        rewritten_prompt = prompt
-    st.session_state.chat_history.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
-
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
+    with tracer.trace("turn", session_id=session_id, history_turns=len(st.session_state.history)) as trace:
+        history = st.session_state.history
+        st.session_state.chat_history.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        with st.chat_message("assistant"):
+            planned = False
             try:
-                response_text = model_response.process_response(
-                    user_query=rewritten_prompt,
-                    collection=mongo_conn.collection,
-                    embedding_model=embedding_model
-                )
-                st.markdown(response_text)
+                with st.spinner("Thinking..."):
+                    # The planner sees the history before this message
+                    rewritten_prompt, plan, title_matches = resources.plan_turn(history, prompt)
+                    history.add_user(prompt)
+                    planned = True
+                    response_stream = resources.stream_turn(rewritten_prompt, plan, title_matches,
+                                                            on_retrieval=history.record_retrieval)
+                # Render tokens as they arrive; write_stream returns the full text
+                response_text = st.write_stream(response_stream)
                 st.session_state.chat_history.append({"role": "assistant", "content": response_text})
+                history.add_assistant(response_text)
             except Exception as e:
+                # Keep the history in user/assistant pairs even when planning failed
+                if not planned:
+                    history.add_user(prompt)
+                history.add_assistant("")
                 st.error(f"❌ Error: {e}")
 
+    with st.expander("🔍 Debug: latency breakdown"):
+        st.caption(f"Turn total: {trace.duration_ms:.0f} ms")
+        st.dataframe([span.to_dict() for span in trace.spans])
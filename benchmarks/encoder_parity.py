@@ -0,0 +1,153 @@
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.fakes import make_catalog
+from benchmarks.run_benchmark import CONVERSATIONS_PATH, percentiles
+from encoders import DEFAULT_MODEL, ONNX_DIR, load_encoder
+
+# Minimum per-text cosine against the torch embeddings
+THRESHOLDS = {"onnx": 0.999, "onnx-int8": 0.98}
+MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+
+COLD_START = (
+    "import time; started = time.perf_counter(); from encoders import load_encoder; "
+    "load_encoder({backend!r}, onnx_dir={onnx_dir!r}).encode(['warm up']); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def parity_texts(catalog_size, seed):
+    # Real queries from the benchmark conversations plus catalog-style documents
+    with open(CONVERSATIONS_PATH, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    queries = [turn.get("standalone") or turn["user"] for c in conversations for turn in c["turns"]]
+    documents = [f"{g['name']} {g['description']}" for g in make_catalog(catalog_size, seed=seed)]
+    return queries, documents
+
+
+def query_latency(encoder, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            encoder.encode(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return percentiles(latencies)
+
+
+def cold_start_ms(backend, onnx_dir):
+    # Fresh interpreter: import the runtime, load the model and encode once
+    output = subprocess.run([sys.executable, "-c", COLD_START.format(backend=backend, onnx_dir=onnx_dir)],
+                            capture_output=True, text=True, check=True).stdout
+    return round(float(output.strip().splitlines()[-1]), 1)
+
+
+def top_k_overlap(query_vectors, document_vectors, reference_queries, reference_documents, k):
+    found = np.argsort(-(query_vectors @ document_vectors.T), axis=1)[:, :k]
+    expected = np.argsort(-(reference_queries @ reference_documents.T), axis=1)[:, :k]
+    return float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)]))
+
+
+def skip_reason(backend, onnx_dir=ONNX_DIR):
+    # Why a backend cannot be checked here, or None
+    model_path = os.path.join(onnx_dir, MODEL_FILES[backend])
+    if not os.path.exists(model_path):
+        return f"{model_path} not found (export it with python encoders.py)"
+    for module in ("onnxruntime", "tokenizers", "sentence_transformers"):
+        if importlib.util.find_spec(module) is None:
+            return f"{module} is not installed"
+    return None
+
+
+def check_parity(backends=tuple(THRESHOLDS), model_name=DEFAULT_MODEL, onnx_dir=ONNX_DIR, catalog_size=500, seed=0,
+                 k=5, encoders=None):
+    # Per backend: min/mean cosine and top-k overlap against SentenceTransformer
+    # plus a status of "passed", "failed" (min cosine under THRESHOLDS) or
+    # "skipped" when the exported model or a runtime is missing. A test or CI
+    # step can assert that nothing failed. Loaded encoders go into `encoders`.
+    results = {}
+    for backend in backends:
+        reason = skip_reason(backend, onnx_dir)
+        if reason:
+            results[backend] = {"status": "skipped", "reason": reason}
+    checked = [backend for backend in backends if backend not in results]
+    if not checked:
+        return results
+
+    queries, documents = parity_texts(catalog_size, seed)
+    reference = load_encoder("torch", model_name)
+    reference_queries = reference.encode(queries, batch_size=64)
+    reference_documents = reference.encode(documents, batch_size=64)
+    if encoders is not None:
+        encoders["torch"] = reference
+    for backend in checked:
+        encoder = load_encoder(backend, model_name, onnx_dir=onnx_dir)
+        if encoders is not None:
+            encoders[backend] = encoder
+        query_vectors = encoder.encode(queries, batch_size=64)
+        document_vectors = encoder.encode(documents, batch_size=64)
+        cosines = np.concatenate([
+            np.sum(query_vectors * reference_queries, axis=1),
+            np.sum(document_vectors * reference_documents, axis=1),
+        ])
+        min_cosine = round(float(cosines.min()), 5)
+        results[backend] = {
+            "status": "passed" if min_cosine >= THRESHOLDS[backend] else "failed",
+            "min_cosine": min_cosine,
+            "mean_cosine": round(float(cosines.mean()), 5),
+            f"top{k}_overlap": round(top_k_overlap(query_vectors, document_vectors,
+                                                   reference_queries, reference_documents, k), 4),
+        }
+    return results
+
+
+def run(args):
+    encoders = {}
+    report = check_parity(args.backends, args.model, args.onnx_dir, args.catalog_size, args.seed, args.k, encoders)
+    for backend, result in report.items():
+        if result["status"] == "skipped":
+            print(f"{backend}: skipped - {result['reason']}")
+        else:
+            print(f"{backend}: min cosine {result['min_cosine']} (threshold {THRESHOLDS[backend]}), "
+                  f"top-{args.k} overlap {result[f'top{args.k}_overlap']} - {result['status'].upper()}")
+
+    if not args.check and "torch" in encoders:
+        queries, _ = parity_texts(args.catalog_size, args.seed)
+        for backend, encoder in encoders.items():
+            report.setdefault(backend, {})["query_latency"] = query_latency(encoder, queries, args.repeat)
+            if args.cold_start:
+                report[backend]["cold_start_ms"] = cold_start_ms(backend, args.onnx_dir)
+        for backend in args.backends:
+            if backend in encoders:
+                print(f"{backend}: p50 {report[backend]['query_latency']['p50_ms']} ms "
+                      f"vs torch {report['torch']['query_latency']['p50_ms']} ms")
+        print(json.dumps(report, indent=2))
+    return [backend for backend, result in report.items() if result.get("status") == "failed"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check ONNX encoder parity and latency against SentenceTransformer")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--onnx-dir", default=ONNX_DIR)
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=list(THRESHOLDS))
+    parser.add_argument("--catalog-size", type=int, default=500, help="Synthetic documents for the parity set")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the queries for latency")
+    parser.add_argument("--cold-start", action="store_true", help="Also time load + first encode in a fresh process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true",
+                        help="Parity thresholds only, for CI: exits 1 on a failure, 0 when passed or skipped")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python encoders.py && python -m benchmarks.encoder_parity --cold-start
+    # CI: python -m benchmarks.encoder_parity --check
+    sys.exit(1 if run(parse_args()) else 0)
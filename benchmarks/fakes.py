@@ -0,0 +1,390 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from search_filters import normalize_game_fields
+
+
+EMBEDDING_DIM = 384
+
+
+class FakeEmbeddingModel:
+    # Deterministic hashed bag-of-words encoder with the SentenceTransformer
+    # encode() signature; latency simulates a MiniLM forward pass on CPU.
+    # exclusive=True runs one pass at a time, like a model that saturates the cores.
+    def __init__(self, dim=EMBEDDING_DIM, latency=0.0, per_text_latency=0.0, exclusive=False):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self._pass_lock = threading.Lock() if exclusive else None
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.calls += 1
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if self._pass_lock is not None:
+            with self._pass_lock:
+                time.sleep(self.latency + self.per_text_latency * len(batch))
+        else:
+            time.sleep(self.latency + self.per_text_latency * len(batch))
+        encoded = np.stack([self._encode_one(t) for t in batch]) if batch else np.zeros((0, self.dim), np.float32)
+        return encoded[0] if single else encoded
+
+
+GENRES = ["open world RPG", "co-op shooter", "tactical football", "farming sim", "roguelike deckbuilder",
+          "survival horror", "racing", "city builder", "puzzle platformer", "grand strategy", "fighting",
+          "visual novel", "metroidvania", "battle royale", "space sim", "tower defense"]
+ADJECTIVES = ["Dark", "Lost", "Eternal", "Crimson", "Iron", "Silent", "Neon", "Hollow", "Wild", "Frozen",
+              "Golden", "Broken", "Savage", "Ancient", "Last", "Hidden"]
+NOUNS = ["Kingdom", "Legends", "Frontier", "Protocol", "Harvest", "Odyssey", "Arena", "Empire", "Tactics",
+         "Souls", "Drift", "Colony", "Circuit", "Dungeon", "Horizon", "Outpost"]
+STUDIOS = ["Ubisoft", "SEGA", "Valve", "Paradox Interactive", "Devolver Digital", "CD PROJEKT RED",
+           "Bandai Namco", "Team17", "Annapurna Interactive", "Indie Studio"]
+REVIEWS = ["Overwhelmingly Positive", "Very Positive", "Mostly Positive", "Mixed", "Mostly Negative"]
+
+
+def make_catalog(size, seed=0):
+    rng = random.Random(seed)
+    games = []
+    for i in range(size):
+        genre = rng.choice(GENRES)
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        developer = rng.choice(STUDIOS)
+        price = rng.choice([0, 4.99, 9.99, 14.99, 19.99, 29.99, 59.99])
+        games.append({
+            "name": name,
+            "description": f"{name} is a {genre} game with {rng.choice(['story', 'multiplayer', 'crafting', 'pixel art', 'physics'])} focus",
+            "all_reviews": rng.choice(REVIEWS),
+            "release_date": datetime(rng.randint(2005, 2025), rng.randint(1, 12), 1),
+            "developer": developer,
+            "publisher": rng.choice([developer, rng.choice(STUDIOS)]),
+            "price": "Free to Play" if price == 0 else f"${price}",
+        })
+    return games
+
+
+def embed_catalog(games, embedding_model, batch_size=512):
+    for start in range(0, len(games), batch_size):
+        batch = games[start:start + batch_size]
+        texts = [f"{g['name']} {g['description']}" for g in batch]
+        for game, vector in zip(batch, embedding_model.encode(texts, batch_size=batch_size)):
+            game["embedding"] = vector.tolist()
+            game.update(normalize_game_fields(game))
+    return games
+
+
+def embed_catalog_chunks(games, embedding_model, path="embedding_chunks", batch_size=512):
+    # Notebook-style chunked layout: the name line and each description sentence get their own vector
+    for start in range(0, len(games), batch_size):
+        batch = games[start:start + batch_size]
+        texts = [[g["name"], *[s for s in g["description"].split(". ") if s]] for g in batch]
+        vectors = iter(embedding_model.encode([t for chunks in texts for t in chunks], batch_size=batch_size))
+        for game, chunks in zip(batch, texts):
+            game[path] = [next(vectors).tolist() for _ in chunks]
+            game.update(normalize_game_fields(game))
+    return games
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$exists" and (key in doc) != operand:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+    return True
+
+
+class FakeCollection:
+    # In-memory stand-in for Steam_Embedding supporting the aggregate stages
+    # the pipeline uses ($vectorSearch, $unset, $project) plus find().
+    def __init__(self, documents, latency=0.0):
+        self.documents = documents
+        self.latency = latency
+        self._embeddings = {}
+        self._lock = threading.Lock()
+
+    def _matrix(self, path):
+        with self._lock:
+            if path not in self._embeddings:
+                rows = [np.asarray(doc.get(path) or np.zeros(EMBEDDING_DIM), dtype=np.float32) for doc in self.documents]
+                matrix = np.vstack(rows)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                self._embeddings[path] = matrix / norms
+            return self._embeddings[path]
+
+    def _vector_search(self, stage):
+        query = np.asarray(stage["queryVector"], dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self._matrix(stage["path"]) @ query
+        order = np.argsort(-scores)
+        # Approximate search only looks at numCandidates neighbours before filtering
+        order = order[:stage["numCandidates"]]
+        hits = []
+        for i in order:
+            doc = self.documents[i]
+            if "filter" in stage and not _matches(doc, stage["filter"]):
+                continue
+            hits.append(dict(doc, _score=float((1 + scores[i]) / 2)))
+            if len(hits) >= stage["limit"]:
+                break
+        return hits
+
+    @staticmethod
+    def _project(doc, projection):
+        include = {k: v for k, v in projection.items() if k != "_id"}
+        projected = {}
+        for key, value in include.items():
+            if isinstance(value, dict) and value.get("$meta") == "vectorSearchScore":
+                projected[key] = doc.get("_score")
+            elif value and key in doc:
+                projected[key] = doc[key]
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+
+    def aggregate(self, pipeline):
+        time.sleep(self.latency)
+        docs = self.documents
+        for stage in pipeline:
+            if "$vectorSearch" in stage:
+                docs = self._vector_search(stage["$vectorSearch"])
+            elif "$unset" in stage:
+                fields = stage["$unset"] if isinstance(stage["$unset"], list) else [stage["$unset"]]
+                docs = [{k: v for k, v in doc.items() if k not in fields} for doc in docs]
+            elif "$project" in stage:
+                docs = [self._project(doc, stage["$project"]) for doc in docs]
+            elif "$match" in stage:
+                docs = [doc for doc in docs if _matches(doc, stage["$match"])]
+            elif "$limit" in stage:
+                docs = docs[:stage["$limit"]]
+            else:
+                raise NotImplementedError(f"Unsupported stage: {list(stage)}")
+        return iter(docs)
+
+    def find(self, query=None, projection=None, batch_size=None):
+        for doc in self.documents:
+            if query and not _matches(doc, query):
+                continue
+            yield self._project(doc, projection) if projection else dict(doc)
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+
+def _function_call_response(name, args):
+    function_call = SimpleNamespace(name=name, args=args)
+    part = SimpleNamespace(function_call=function_call, text=None)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], text=None)
+
+
+def _text_response(text):
+    part = SimpleNamespace(function_call=None, text=text)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], text=text)
+
+
+def default_route(query):
+    text = query.lower()
+    if re.search(r"\b(bye|goodbye|that's all|end chat)\b", text):
+        return "end_chat", {"query": query}
+    if re.fullmatch(r"\W*(hi|hello|hey|thanks|thank you)\b.*", text):
+        return "chit_chat", {"query": query}
+    args = {"query": query}
+    years = [int(y) for y in re.findall(r"\b(?:19|20)\d{2}\b", text)]
+    if years:
+        args["year_range"] = [min(years), max(years) if len(years) > 1 else 2025]
+    price = re.search(r"under \$?(\d+)", text)
+    if price:
+        args["price_limit"] = float(price.group(1))
+    for sentiment in ["Positive", "Mixed", "Negative"]:
+        if sentiment.lower() in text:
+            args["review_sentiment"] = sentiment
+            break
+    return "vector_search_filtered", args
+
+
+class FakeAPIError(Exception):
+    # Shaped like google.genai.errors.APIError: the HTTP status is in .code
+    def __init__(self, code, status):
+        super().__init__(f"{code} {status}")
+        self.code = code
+
+
+class FakeModels:
+    def __init__(self, client):
+        self.client = client
+
+    @contextmanager
+    def _admit(self):
+        # Injected failures: an outage (503), calls beyond the quota of
+        # concurrent requests (429) and random 429s at error_rate
+        client = self.client
+        with client._lock:
+            if client.down:
+                client.calls["errors_503"] = client.calls.get("errors_503", 0) + 1
+                raise FakeAPIError(503, "UNAVAILABLE")
+            if (client.quota is not None and client.inflight >= client.quota) or client.random.random() < client.error_rate:
+                client.calls["errors_429"] = client.calls.get("errors_429", 0) + 1
+                raise FakeAPIError(429, "RESOURCE_EXHAUSTED")
+            client.inflight += 1
+            client.peak_inflight = max(client.peak_inflight, client.inflight)
+        try:
+            yield
+        finally:
+            with client._lock:
+                client.inflight -= 1
+
+    def _sleep(self, seconds):
+        if seconds:
+            time.sleep(seconds * (1 + self.client.jitter * (self.client.random.random() * 2 - 1)))
+
+    def generate_content(self, model, contents, config=None):
+        with self._admit():
+            return self._generate_content(contents, config)
+
+    def _generate_content(self, contents, config):
+        client = self.client
+        client.count("generate_content")
+        tools = getattr(config, "tools", None)
+        if tools:
+            self._sleep(client.routing_latency)
+            name, args = client.route(contents)
+            return _function_call_response(name, args)
+
+        if getattr(config, "response_mime_type", None) == "application/json":
+            self._sleep(client.routing_latency)
+            new_prompt = client.extract_new_prompt(contents)
+            standalone = client.standalone(new_prompt)
+            name, args = client.route(standalone)
+            plan = {"standalone_query": standalone, "tool": name}
+            plan.update({k: v for k, v in args.items() if k != "query"})
+            return _text_response(json.dumps(plan))
+
+        if "New prompt:" in contents:
+            self._sleep(client.reflection_latency)
+            return _text_response(client.standalone(client.extract_new_prompt(contents)))
+
+        self._sleep(client.generation_latency)
+        return _text_response(client.answer(contents))
+
+    def generate_content_stream(self, model, contents, config=None):
+        client = self.client
+        with self._admit():
+            client.count("generate_content_stream")
+            self._sleep(client.first_token_latency)
+            text = client.answer(contents)
+            words = text.split(" ")
+            step = max(1, len(words) // client.stream_chunks)
+            for i in range(0, len(words), step):
+                if i:
+                    self._sleep(client.chunk_latency)
+                yield _text_response(" ".join(words[i:i + step]) + " ")
+
+
+class FakeGenaiClient:
+    # Drop-in for google.genai.Client: same client.models.generate_content /
+    # generate_content_stream calls, simulated latency and scripted routing,
+    # plus injected 429s (error_rate, quota of concurrent calls) and outages (down).
+    def __init__(self, script=None, routing_latency=0.4, reflection_latency=0.4, generation_latency=1.5,
+                 first_token_latency=0.3, chunk_latency=0.05, stream_chunks=10, jitter=0.0, seed=0,
+                 error_rate=0.0, quota=None):
+        self.script = script or {}
+        self.routing_latency = routing_latency
+        self.reflection_latency = reflection_latency
+        self.generation_latency = generation_latency
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.stream_chunks = stream_chunks
+        self.jitter = jitter
+        self.calls = {}
+        self.error_rate = error_rate
+        self.quota = quota
+        self.down = False
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.models = FakeModels(self)
+
+    @classmethod
+    def from_conversations(cls, conversations, **kwargs):
+        script = {}
+        for conversation in conversations:
+            for turn in conversation["turns"]:
+                script[turn["user"]] = turn
+                if turn.get("standalone"):
+                    script[turn["standalone"]] = turn
+        return cls(script=script, **kwargs)
+
+    def count(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    @staticmethod
+    def extract_new_prompt(contents):
+        tail = contents.rsplit("New prompt:", 1)[-1]
+        return tail.split("Return only", 1)[0].strip()
+
+    def standalone(self, new_prompt):
+        turn = self.script.get(new_prompt)
+        return (turn.get("standalone") or new_prompt) if turn else new_prompt
+
+    def route(self, query):
+        turn = self.script.get(query)
+        if turn and turn.get("tool"):
+            return turn["tool"], dict(turn.get("args", {}), query=query)
+        return default_route(query)
+
+    def answer(self, contents):
+        names = re.findall(r"^\s*([^:\n]+):", contents.split("Relevant Games:", 1)[-1], flags=re.MULTILINE)
+        if names and "Relevant Games:" in contents:
+            return "You should try " + ", ".join(n.strip() for n in names[:3]) + ". " + "Great pick. " * 20
+        return "Happy to help you find your next game! " * 5
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fakes import FakeCollection, FakeEmbeddingModel, FakeGenaiClient, embed_catalog, make_catalog
+from benchmarks.run_benchmark import CONVERSATIONS_PATH, percentiles
+from encoders import MicroBatchEncoder
+from pipeline import EmbeddingModelSentence, ModelResponse
+from resources import Resources
+from server import ChatServer
+from vector_index import LocalVectorIndex
+
+
+def build_resources(args, catalog, conversations, micro_batch_ms):
+    # Same wiring as resources.load_resources, with local stand-ins for Atlas,
+    # the encoder and Gemini
+    encoder = FakeEmbeddingModel(latency=args.encoder_latency, per_text_latency=args.per_text_latency, exclusive=True)
+    if micro_batch_ms:
+        encoder = MicroBatchEncoder(encoder, max_batch=args.max_batch, window_ms=micro_batch_ms)
+    # Cache off so every request reaches the encoder
+    embedding_model = EmbeddingModelSentence(encoder, cache_size=args.embedding_cache_size)
+    collection = FakeCollection(catalog, latency=args.db_latency)
+    vector_index = LocalVectorIndex.from_collection(collection) if args.backend == "local" else None
+    client = FakeGenaiClient.from_conversations(
+        conversations,
+        routing_latency=args.llm_latency,
+        reflection_latency=args.llm_latency,
+        generation_latency=args.llm_latency,
+        first_token_latency=args.llm_latency,
+        chunk_latency=0.0,
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+    model_response = ModelResponse(None, speculative=True, client=client)
+    return Resources(None if vector_index is not None else _Connection(collection), vector_index, embedding_model,
+                     model_response, use_planner=True), encoder
+
+
+class _Connection:
+    # MongoDBConnection stand-in exposing the one attribute Resources reads
+    def __init__(self, collection):
+        self.collection = collection
+
+
+async def user(session, url, user_id, conversations, args, latencies, errors):
+    order = list(conversations)
+    random.Random(args.seed + user_id).shuffle(order)
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        for conversation in order:
+            session_id = f"user-{user_id}-{conversation['name']}-{time.perf_counter()}"
+            for turn in conversation["turns"]:
+                if args.endpoint == "chat":
+                    payload, path = {"message": turn["user"], "session_id": session_id}, "/chat"
+                else:
+                    # The scripted router arguments double as the search filters
+                    payload, path = {**turn.get("args", {}), "query": turn.get("standalone") or turn["user"]}, "/search"
+                started = time.perf_counter()
+                async with session.post(url + path, json=payload) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors.append(response.status)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if time.perf_counter() >= deadline:
+                    return
+
+
+async def run_level(args, catalog, conversations, users, micro_batch_ms):
+    resources, encoder = build_resources(args, catalog, conversations, micro_batch_ms)
+    server = ChatServer(resources, workers=max(args.workers, users))
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}"
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*(user(session, url, i, conversations, args, latencies, errors) for i in range(users)))
+    finally:
+        elapsed = time.perf_counter() - started
+        await runner.cleanup()
+
+    inner = encoder.encoder if isinstance(encoder, MicroBatchEncoder) else encoder
+    return {
+        "users": users,
+        "micro_batch_ms": micro_batch_ms,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency": percentiles(latencies),
+        "encoder_passes": inner.calls,
+        "micro_batching": encoder.stats() if isinstance(encoder, MicroBatchEncoder) else None,
+    }
+
+
+def run(args):
+    with open(CONVERSATIONS_PATH, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    # One embedded catalog reused by every level
+    catalog = embed_catalog(make_catalog(args.catalog_size, seed=args.seed), FakeEmbeddingModel())
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "levels": []}
+    for users in args.users:
+        for micro_batch_ms in args.micro_batch_ms:
+            level = asyncio.run(run_level(args, catalog, conversations, users, micro_batch_ms))
+            report["levels"].append(level)
+            batching = level["micro_batching"]
+            print(f"{args.endpoint} users={users:<4} window={micro_batch_ms:<4} ms "
+                  f"{level['throughput_rps']:>8} req/s  p50 {level['latency']['p50_ms']:>9} ms  "
+                  f"p95 {level['latency']['p95_ms']:>9} ms  encoder passes {level['encoder_passes']}"
+                  + (f" (mean batch {batching['mean_batch_size']})" if batching else "")
+                  + (f"  errors {level['errors']}" if level["errors"] else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test server.py with concurrent users against local stand-ins")
+    parser.add_argument("--endpoint", choices=["chat", "search"], default="chat")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32, 64], help="Concurrent users per level")
+    parser.add_argument("--micro-batch-ms", type=float, nargs="+", default=[0, 5],
+                        help="Micro-batching windows to compare (0 = every request encodes alone)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--backend", choices=["mongo", "local"], default="local")
+    parser.add_argument("--encoder-latency", type=float, default=0.015, help="Fixed cost of one forward pass (s)")
+    parser.add_argument("--per-text-latency", type=float, default=0.001, help="Extra cost per text in a pass (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Simulated latency of each Gemini call (s)")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Simulated Atlas round trip (s)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--embedding-cache-size", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.load_test --endpoint search --users 1 16 64
+    run(parse_args())
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fakes import ADJECTIVES, GENRES, NOUNS, STUDIOS
+from preprocessing import ParquetCatalog, load_stop_words, preprocess, read_catalog, to_records, write_catalog
+from search_filters import normalize_game_fields
+
+
+PRICES = ["$4.99", "$9.99", "$14.99", "$19.99", "$29.99", "$59.99", "$1,299.00", "Free to Play", "Free",
+          "Play Game Demo", "120.000₫", "49.000₫", "1.250.000₫", "Coming soon", None]
+PRICE_WEIGHTS = [8, 10, 8, 8, 5, 3, 0.2, 10, 3, 1, 3, 3, 1, 2, 4]
+REVIEWS = ["Overwhelmingly Positive", "Very Positive", "Positive", "Mostly Positive", "Mixed", "Mostly Negative",
+           "Negative", "Very Negative", "3 user reviews", "9 user reviews", None]
+REVIEW_WEIGHTS = [3, 10, 8, 8, 10, 4, 2, 1, 8, 8, 12]
+DATE_FORMATS = ["%b %d, %Y", "%d %b, %Y"]
+WORDS = ("the and you your will with for this that into from are is it's don't can't each more all new "
+         "explore build craft fight survive roguelike dungeon open world story co-op online pixel art "
+         "strategy puzzle racing city farm space colony hero quest magic sword ship crew boss level").split()
+CATEGORICAL = ["all_reviews", "developer", "publisher"]
+NOISE = ["!", "...", "?", "—", ",", "(", ")", ":", "🙂", "🔥", "🎮", "1️⃣", "ℹ️", "™", "®", "#1", "100%", "&"]
+
+
+def make_raw_catalog(size, seed=0):
+    # Crawler-shaped rows (CrawlDataSteam.scrape_game_data) with the messy
+    # values the notebook cleans: ₫ prices, "N user reviews", missing studios,
+    # two date layouts, emoji, URLs and punctuation in descriptions
+    rng = np.random.default_rng(seed)
+    studios = np.array(STUDIOS + [f"{a} {n} Studio" for a in ADJECTIVES for n in NOUNS[:4]] + [None], dtype=object)
+
+    dates = pd.to_datetime("2005-01-01") + pd.to_timedelta(rng.integers(0, 7300, size), unit="D")
+    fmt = rng.random(size) < 0.1
+    release = np.where(fmt, dates.strftime(DATE_FORMATS[1]), dates.strftime(DATE_FORMATS[0])).astype(object)
+    release[rng.random(size) < 0.02] = "Coming soon"
+
+    words = np.array(WORDS + GENRES + [n.lower() for n in NOUNS], dtype=object)
+    lengths = rng.integers(20, 120, size)
+    tokens = words[rng.integers(0, len(words), lengths.sum())]
+    noise = rng.random(len(tokens)) < 0.08
+    tokens[noise] = tokens[noise] + np.array(NOISE, dtype=object)[rng.integers(0, len(NOISE), noise.sum())]
+    descriptions = [" ".join(chunk) for chunk in np.split(tokens, np.cumsum(lengths)[:-1])]
+    for i in np.flatnonzero(rng.random(size) < 0.05):
+        descriptions[i] += f" Join us at https://discord.gg/{i} or http://example.com/game?id={i}!"
+    descriptions = np.array(descriptions, dtype=object)
+    descriptions[rng.random(size) < 0.01] = None
+
+    counts = rng.integers(10, 50000, size).astype(str).astype(object)
+    counts[rng.random(size) < 0.1] = None
+    return pd.DataFrame({
+        "app_id": np.arange(10, 10 + size * 10, 10),
+        "name": [f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[i % len(NOUNS)]} {i}" for i in range(size)],
+        "all_reviews": rng.choice(np.array(REVIEWS, dtype=object), size, p=np.array(REVIEW_WEIGHTS) / sum(REVIEW_WEIGHTS)),
+        "all_count": counts,
+        "release_date": release,
+        "developer": studios[rng.integers(0, len(studios), size)],
+        "publisher": studios[rng.integers(0, len(studios), size)],
+        "price": rng.choice(np.array(PRICES, dtype=object), size, p=np.array(PRICE_WEIGHTS) / sum(PRICE_WEIGHTS)),
+        "description": descriptions,
+    })
+
+
+def legacy_preprocess(game_data, stop_words):
+    # preprocessing_game.ipynb cell by cell, kept here as the reference output.
+    # One fix: the notebook's price[1:] dropped the first digit of ₫ amounts.
+    import emoji
+
+    game_data = game_data.copy()
+
+    def converting_price(price):
+        price = str(price).lower()
+
+        if 'free' in price or 'demo' in price:
+            return '$0'
+        elif '₫' in price:
+            price = price.replace('₫', '')
+            price_in_dollar = float(price.replace('.', '')) / 25000
+            return f'${price_in_dollar:.2f}'
+        elif '$' in price:
+            return price
+        else:
+            return
+
+    game_data['price'] = game_data['price'].apply(converting_price)
+    game_data = game_data.dropna(subset=['price'])
+    game_data['release_date'] = pd.to_datetime(game_data['release_date'], errors='coerce')
+    game_data['all_reviews'] = game_data['all_reviews'].fillna('No reviews')
+
+    def review_labeling(review):
+        if 'user reviews' in review:
+            return 'Few user reviews'
+        else:
+            return review
+
+    game_data['all_reviews'] = game_data['all_reviews'].apply(review_labeling)
+    game_data = game_data[~game_data['all_reviews'].isin(['No reviews', 'Few user reviews'])].copy()
+    game_data['developer'] = game_data['developer'].fillna('Unknown')
+    game_data['publisher'] = game_data['publisher'].fillna('Unknown')
+    game_data['all_count'] = pd.to_numeric(game_data['all_count'], errors='coerce').astype('float')
+    game_data['all_count'] = game_data['all_count'].fillna(0)
+
+    def clean_text(text):
+        if not isinstance(text, str):
+            return ""
+        text = emoji.replace_emoji(text, replace='')
+        text = re.sub(r'http\S+', '', text)
+        text = re.sub(r"[^\w\s']", '', text)
+        text = text.lower()
+        text = re.sub(r'\s+', ' ', text).strip()
+        text = ' '.join(word for word in text.split() if word not in stop_words)
+        return text
+
+    game_data['description'] = game_data['description'].apply(clean_text)
+    return game_data.reset_index(drop=True)
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def compare(legacy, games):
+    # Same rows and cleaned values as the notebook, and typed columns equal to
+    # what ingestion derived per game with normalize_game_fields
+    mismatches = {}
+    if len(legacy) != len(games):
+        return {"rows": [len(legacy), len(games)]}
+    for column in ["app_id", "price", "all_reviews", "developer", "publisher", "all_count", "description"]:
+        left, right = legacy[column].astype(object), games[column].astype(object)
+        diff = int((left != right).sum())
+        if diff:
+            mismatches[column] = diff
+    if not legacy["release_date"].equals(games["release_date"]):
+        mismatches["release_date"] = int((legacy["release_date"].fillna(pd.Timestamp(0))
+                                          != games["release_date"].fillna(pd.Timestamp(0))).sum())
+
+    expected = pd.DataFrame([normalize_game_fields(game) for game in legacy.to_dict("records")])
+    typed = pd.DataFrame(to_records(games[expected.columns]))
+    for column in expected.columns:
+        left, right = expected[column].astype(object), typed[column].astype(object)
+        diff = int(((left != right) & ~(left.isna() & right.isna())).sum())
+        if diff:
+            mismatches[column] = diff
+    return mismatches
+
+
+def run(args):
+    stop_words = load_stop_words()
+    raw, generate_time = timed(make_raw_catalog, args.size, args.seed)
+    print(f"Synthetic crawl: {len(raw):,} games in {generate_time:.1f}s")
+
+    games, vectorized_time = timed(preprocess, raw, stop_words=stop_words)
+    print(f"Vectorized: {len(games):,} games kept in {vectorized_time:.2f}s ({len(raw) / vectorized_time:,.0f} games/s)")
+    report = {"config": vars(args), "rows": len(raw), "kept": len(games), "vectorized_s": round(vectorized_time, 3)}
+
+    ok = True
+    if not args.skip_legacy:
+        sample = raw.iloc[:args.legacy_rows] if args.legacy_rows else raw
+        legacy, legacy_time = timed(legacy_preprocess, sample, stop_words)
+        scale = len(raw) / len(sample)
+        vectorized = games if len(sample) == len(raw) else preprocess(sample, stop_words=stop_words)
+        mismatches = compare(legacy, vectorized)
+        ok = not mismatches
+        print(f"Notebook:   {len(legacy):,} games kept in {legacy_time:.2f}s ({len(sample) / legacy_time:,.0f} games/s"
+              f"{', timed on ' + format(len(sample), ',') + ' rows' if scale > 1 else ''}), "
+              f"{legacy_time * scale / vectorized_time:.1f}x slower")
+        print(f"Outputs identical: {'OK' if ok else f'FAILED {mismatches}'}")
+        legacy_bytes = legacy[CATEGORICAL].memory_usage(deep=True).sum() * scale
+        report.update(legacy_s=round(legacy_time, 3), legacy_rows=len(sample), speedup=round(legacy_time * scale / vectorized_time, 1),
+                      mismatches=mismatches, legacy_memory_mb=round(legacy_bytes / 1e6, 1))
+    report["memory_mb"] = round(games[CATEGORICAL].memory_usage(deep=True).sum() / 1e6, 1)
+    print(f"Reviews, developer and publisher in memory: {report['memory_mb']} MB as categoricals"
+          + (f", {report['legacy_memory_mb']} MB as strings" if "legacy_memory_mb" in report else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "steam_games")
+        _, write_time = timed(write_catalog, games, path)
+        parquet_bytes = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+        csv_path = os.path.join(tmp, "steam_game_descriptions_cleaned.csv")
+        _, csv_time = timed(games.to_csv, csv_path, index=False)
+        print(f"Parquet: {parquet_bytes / 1e6:.1f} MB in {len(os.listdir(path))} year partitions, written in {write_time:.2f}s "
+              f"(CSV {os.path.getsize(csv_path) / 1e6:.1f} MB in {csv_time:.2f}s)")
+
+        full, read_time = timed(read_catalog, path)
+        recent, pruned_time = timed(read_catalog, path, columns=["name", "price_value", "release_year"], year_range=[2020, 2024])
+        _, csv_read_time = timed(pd.read_csv, csv_path)
+        print(f"Read back: full catalog {read_time:.2f}s (CSV {csv_read_time:.2f}s), "
+              f"{len(recent):,} games from 2020-2024 {pruned_time:.3f}s")
+        streamed, stream_time = timed(lambda: sum(1 for _ in ParquetCatalog(path).find({}, batch_size=2000)))
+        print(f"Ingestion stream: {streamed:,} records in {stream_time:.2f}s")
+        ok = ok and len(full) == len(games) == streamed and recent["release_year"].between(2020, 2024).all()
+        report.update(parquet_mb=round(parquet_bytes / 1e6, 1), csv_mb=round(os.path.getsize(csv_path) / 1e6, 1),
+                      write_parquet_s=round(write_time, 3), read_parquet_s=round(read_time, 3),
+                      read_csv_s=round(csv_read_time, 3), read_year_range_s=round(pruned_time, 3),
+                      ingestion_stream_s=round(stream_time, 3))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the notebook cleaning with preprocessing.py on a synthetic crawl")
+    parser.add_argument("--size", type=int, default=500000, help="Games in the synthetic crawl (10x the 50,000-app cap)")
+    parser.add_argument("--legacy-rows", type=int, default=0,
+                        help="Time the notebook version on the first N rows only and scale (0 = all rows)")
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.preprocessing_benchmark --size 500000
+    sys.exit(0 if run(parse_args()) else 1)
@@ -0,0 +1,116 @@
+import argparse
+import json
+import time
+
+import bson
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+from benchmarks.fakes import FakeCollection, FakeEmbeddingModel, embed_catalog, make_catalog
+from benchmarks.run_benchmark import percentiles
+from vector_index import QUANTIZATION_MODES, LocalVectorIndex, QuantizedVectorIndex, quantize
+
+
+def load_index(args):
+    if args.index_dir:
+        return LocalVectorIndex.load(args.index_dir, mmap=False)
+    catalog = embed_catalog(make_catalog(args.catalog_size, seed=args.seed), FakeEmbeddingModel())
+    return LocalVectorIndex.from_collection(FakeCollection(catalog))
+
+
+def make_queries(index, count, noise, seed):
+    # Catalog rows plus noise stand in for query embeddings near real games
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=count, replace=count > len(index))
+    queries = index.embeddings[rows] + rng.normal(0, noise, size=(count, index.dim)).astype(np.float32)
+    return LocalVectorIndex._normalize(queries)
+
+
+def document_vector_bytes(vector):
+    # BSON bytes per Mongo document for each storage format of one embedding
+    sizes = {"array (float64)": len(bson.encode({"embedding": vector.astype(np.float64).tolist()}))}
+    sizes["binData float32"] = len(bson.encode({"embedding": Binary.from_vector(vector.tolist(), BinaryVectorDtype.FLOAT32)}))
+    codes, _ = quantize(vector[None], "int8")
+    sizes["binData int8"] = len(bson.encode({"embedding": Binary.from_vector(codes[0].tolist(), BinaryVectorDtype.INT8)}))
+    packed = np.packbits(vector > 0)
+    sizes["binData packed bit"] = len(bson.encode({"embedding": Binary.from_vector(packed.tolist(), BinaryVectorDtype.PACKED_BIT)}))
+    return sizes
+
+
+def recall(found, truth):
+    return float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth)]))
+
+
+def names(results):
+    return [{hit["name"] for hit in hits} for hits in results]
+
+
+def evaluate(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        hits = index.search(query, limit=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(hits)
+    return results, percentiles(latencies)
+
+
+def run(args):
+    index = load_index(args)
+    queries = make_queries(index, args.queries, args.noise, args.seed)
+    report = {"catalog": len(index), "dim": index.dim, "k": args.k,
+              "document_vector_bytes": document_vector_bytes(index.embeddings[0])}
+
+    baseline, baseline_latency = evaluate(index, queries, args.k)
+    truth = names(baseline)
+    report["float32"] = {"index_mb": round(index.embeddings.nbytes / 1e6, 2), "recall": 1.0, "latency": baseline_latency}
+    print(f"float32: {report['float32']['index_mb']} MB, p50 {baseline_latency['p50_ms']} ms")
+
+    for mode in args.modes:
+        started = time.perf_counter()
+        quantized = QuantizedVectorIndex.from_index(index, mode=mode, rescore_factor=args.rescore_factor)
+        build_s = time.perf_counter() - started
+
+        # First pass alone (shortlist of exactly k) shows what the rescoring buys back
+        first_pass = [{quantized.metadata["name"][i] for i in np.argsort(-scores)[:args.k]}
+                      for scores in quantized.approximate_scores(queries)]
+        results, latency = evaluate(quantized, queries, args.k)
+        report[mode] = {
+            "index_mb": round(quantized.nbytes / 1e6, 2),
+            "compression": round(index.embeddings.nbytes / quantized.nbytes, 1),
+            "build_s": round(build_s, 3),
+            "rescore_factor": quantized.rescore_factor,
+            "recall_first_pass": round(recall(first_pass, truth), 4),
+            "recall": round(recall(names(results), truth), 4),
+            "latency": latency,
+        }
+        print(f"{mode}: {report[mode]['index_mb']} MB ({report[mode]['compression']}x smaller), "
+              f"recall@{args.k} {report[mode]['recall_first_pass']} -> {report[mode]['recall']} after rescoring, "
+              f"p50 {latency['p50_ms']} ms")
+
+    print(f"Per-document vector bytes: {report['document_vector_bytes']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k and latency of quantized vector indexes against float32")
+    parser.add_argument("--index-dir", default=None, help="Local index snapshot (default: synthetic catalog)")
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.02, help="Gaussian noise added to catalog rows for queries")
+    parser.add_argument("--modes", nargs="+", default=QUANTIZATION_MODES, choices=QUANTIZATION_MODES)
+    parser.add_argument("--rescore-factor", type=int, default=None, help="Shortlist size as a multiple of k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.quantization_report --index-dir steam_index
+    run(parse_args())
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.fakes import (FakeCollection, FakeEmbeddingModel, FakeGenaiClient, embed_catalog, embed_catalog_chunks,
+                              make_catalog)
+from chat_history import ChatHistory
+from context_builder import RETRIEVAL_ONLY_INTRO
+from llm_gateway import LLMGateway
+from pipeline import CHAT_FALLBACK, EmbeddingModelSentence, ModelResponse
+from planner import QueryPlanner
+from reflection import Reflection
+from response_cache import SemanticResponseCache
+from title_index import TitleIndex
+from tracing import tracer
+from vector_index import CHUNK_AGGREGATES, ChunkedVectorIndex, LocalVectorIndex
+
+
+CONVERSATIONS_PATH = os.path.join(os.path.dirname(__file__), "conversations.json")
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.traces = []
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        with self._lock:
+            self.traces.append(trace.to_dict())
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(len(values)),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def build_environment(args):
+    encoder = FakeEmbeddingModel(latency=args.encoder_latency)
+    if args.layout == "chunked":
+        # The fake collection has no $group stage, so chunked retrieval runs on the local index
+        catalog = embed_catalog_chunks(make_catalog(args.catalog_size, seed=args.seed), encoder)
+        collection = FakeCollection(catalog, latency=args.db_latency)
+        vector_index = ChunkedVectorIndex.from_collection(collection, aggregate=args.chunk_aggregate)
+    else:
+        catalog = embed_catalog(make_catalog(args.catalog_size, seed=args.seed), encoder)
+        collection = FakeCollection(catalog, latency=args.db_latency)
+        vector_index = LocalVectorIndex.from_collection(collection) if args.backend == "local" else None
+
+    with open(CONVERSATIONS_PATH, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    client = FakeGenaiClient.from_conversations(
+        conversations,
+        routing_latency=args.llm_latency,
+        reflection_latency=args.llm_latency,
+        generation_latency=args.generation_latency,
+        first_token_latency=args.first_token_latency,
+        jitter=args.jitter,
+        seed=args.seed,
+        error_rate=args.error_rate,
+        quota=args.quota,
+    )
+    return encoder, collection, vector_index, conversations, client
+
+
+def run_session(session_id, conversations, args, client, collection, vector_index, embedding_model, model_response):
+    reflection = Reflection(client)
+    planner = QueryPlanner(client)
+    order = list(conversations)
+    random.Random(args.seed + session_id).shuffle(order)
+
+    turns = 0
+    outcomes = {"failed": 0, "fallback": 0}
+    chat_history = None
+    for _ in range(args.repeat):
+        for conversation in order:
+            if chat_history is None or not args.continuous:
+                chat_history = ChatHistory() if args.history == "bounded" else []
+            for turn in conversation["turns"]:
+                prompt = turn["user"]
+                bounded = isinstance(chat_history, ChatHistory)
+                try:
+                    with tracer.trace("turn", session_id=session_id, conversation=conversation["name"]):
+                        plan = None
+                        title_matches = model_response.match_title(prompt)
+                        if title_matches:
+                            query = prompt
+                        elif args.planner:
+                            # As Resources.plan_turn: the raw prompt is searched while the planner runs
+                            prefetch = model_response.start_prefetch(prompt, collection, embedding_model, vector_index)
+                            plan = planner.plan(chat_history, prompt)
+                            plan["prefetch"] = prefetch
+                            query = plan["query"]
+                        elif chat_history:
+                            query = reflection.get_standalone_query(chat_history, prompt)
+                        else:
+                            query = prompt
+                        if bounded:
+                            chat_history.add_user(prompt)
+                        chunks = model_response.stream_response(
+                            user_query=query,
+                            collection=collection,
+                            embedding_model=embedding_model,
+                            vector_index=vector_index,
+                            plan=plan,
+                            title_matches=title_matches,
+                            on_retrieval=chat_history.record_retrieval if bounded else None,
+                        )
+                        response_text = "".join(chunks)
+                except Exception as e:
+                    # What the Streamlit app would show as st.error
+                    outcomes["failed"] += 1
+                    print(f"Turn failed: {type(e).__name__}: {e}")
+                    response_text = ""
+                if response_text.startswith((RETRIEVAL_ONLY_INTRO, CHAT_FALLBACK)):
+                    outcomes["fallback"] += 1
+                if bounded:
+                    chat_history.add_assistant(response_text)
+                else:
+                    chat_history.append({"role": "user", "content": prompt})
+                    chat_history.append({"role": "assistant", "content": response_text})
+                turns += 1
+    return turns, outcomes
+
+
+def run(args):
+    encoder, collection, vector_index, conversations, client = build_environment(args)
+    gateway = None
+    if args.gateway:
+        gateway = LLMGateway(client, max_concurrency=args.llm_concurrency, timeout=args.llm_timeout,
+                             base_delay=args.retry_base_delay)
+    llm = gateway or client
+    embedding_model = EmbeddingModelSentence(encoder, cache_size=args.embedding_cache_size)
+    response_cache = SemanticResponseCache() if args.response_cache else None
+    title_index = None
+    if args.title_index:
+        title_index = TitleIndex.from_vector_index(vector_index) if vector_index is not None \
+            else TitleIndex.from_collection(collection)
+    model_response = ModelResponse(None, speculative=args.speculative, response_cache=response_cache, client=llm,
+                                   title_index=title_index, context_token_budget=args.context_budget)
+
+    exporter = CollectingExporter()
+    tracer.add_exporter(exporter)
+    if args.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            futures = [
+                executor.submit(run_session, session_id, conversations, args, llm, collection,
+                                vector_index, embedding_model, model_response)
+                for session_id in range(args.sessions)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        elapsed = time.perf_counter() - started
+        tracer.exporters.remove(exporter)
+        peak_memory = tracemalloc.get_traced_memory()[1] if args.memory else None
+        if args.memory:
+            tracemalloc.stop()
+
+    turns = sum(result[0] for result in results)
+    stages = {}
+    prompt_chars = {}
+    for trace in exporter.traces:
+        stages.setdefault("turn", []).append(trace["duration_ms"])
+        for span in trace["spans"]:
+            stages.setdefault(span["name"], []).append(span["duration_ms"])
+            if span.get("prompt_chars") is not None:
+                prompt_chars.setdefault(span["name"], []).append(span["prompt_chars"])
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "turns": turns,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(turns / elapsed, 3) if elapsed else None,
+        "peak_memory_mb": round(peak_memory / 2 ** 20, 2) if peak_memory is not None else None,
+        "failed_turns": sum(result[1]["failed"] for result in results),
+        "fallback_answers": sum(result[1]["fallback"] for result in results),
+        "llm_calls": dict(client.calls),
+        "llm_peak_concurrency": client.peak_inflight,
+        "llm_gateway": gateway.metrics() if gateway is not None else None,
+        "embedding_cache": embedding_model.cache_info(),
+        "response_cache": response_cache.metrics() if response_cache else None,
+        "stages": {name: percentiles(values) for name, values in sorted(stages.items())},
+        "prompt_chars": {name: {"p50": int(np.percentile(values, 50)), "max": int(max(values))}
+                         for name, values in sorted(prompt_chars.items())},
+    }
+
+
+def compare(report, baseline):
+    print(f"{'stage':<20}{'p50 base':>12}{'p50 now':>12}{'p95 base':>12}{'p95 now':>12}")
+    for name, now in report["stages"].items():
+        base = baseline.get("stages", {}).get(name, {})
+        print(f"{name:<20}{base.get('p50_ms', '-'):>12}{now.get('p50_ms', '-'):>12}"
+              f"{base.get('p95_ms', '-'):>12}{now.get('p95_ms', '-'):>12}")
+    print(f"throughput turns/s: {baseline.get('throughput_turns_per_s')} -> {report['throughput_turns_per_s']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the RAG pipeline")
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--backend", choices=["mongo", "local"], default="mongo",
+                        help="mongo drives the in-memory $vectorSearch stand-in, local the LocalVectorIndex")
+    parser.add_argument("--layout", choices=["game", "chunked"], default="game",
+                        help="One vector per game, or several chunk vectors per game (local index only)")
+    parser.add_argument("--chunk-aggregate", choices=CHUNK_AGGREGATES, default="max")
+    parser.add_argument("--context-budget", type=int, default=None, help="Token budget for retrieved games in the prompt")
+    parser.add_argument("--sessions", type=int, default=1, help="Concurrent chat sessions")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each session replays the corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Simulated routing/reflection latency (s)")
+    parser.add_argument("--generation-latency", type=float, default=1.5, help="Simulated non-streamed generation latency (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="Simulated streaming time to first token (s)")
+    parser.add_argument("--encoder-latency", type=float, default=0.01, help="Simulated query encoder latency (s)")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Simulated Atlas round trip (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative latency jitter")
+    parser.add_argument("--planner", action="store_true", help="Use the fused query planner")
+    parser.add_argument("--speculative", action="store_true", help="Prefetch retrieval during routing or planning")
+    parser.add_argument("--response-cache", action="store_true", help="Enable the semantic response cache")
+    parser.add_argument("--title-index", action="store_true", help="Answer bare game titles without routing")
+    parser.add_argument("--history", choices=["full", "bounded"], default="full",
+                        help="Full transcript or ChatHistory (window, rolling summary, state) in reflection prompts")
+    parser.add_argument("--continuous", action="store_true",
+                        help="Keep one chat history across all conversations, like one long session")
+    parser.add_argument("--gateway", action="store_true", help="Route Gemini calls through the LLM gateway")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Gateway concurrency cap")
+    parser.add_argument("--llm-timeout", type=float, default=20.0, help="Gateway per-call deadline (s)")
+    parser.add_argument("--retry-base-delay", type=float, default=0.5, help="Gateway backoff base (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Gemini calls failing with 429")
+    parser.add_argument("--quota", type=int, default=None, help="Concurrent fake Gemini calls allowed before 429s")
+    parser.add_argument("--embedding-cache-size", type=int, default=4096)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip tracemalloc peak memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.run_benchmark --sessions 8 --speculative --output run.json
+    args = parse_args()
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,121 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fakes import FakeCollection, FakeEmbeddingModel, embed_catalog, make_catalog
+from benchmarks.run_benchmark import percentiles
+from chat_history import ChatHistory
+from pipeline import DataHandler, EmbeddingModelSentence, ModelResponse
+from similar_games import SimilarGames
+from vector_index import LocalVectorIndex
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def latencies(fn, items):
+    values = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        values.append((time.perf_counter() - started) * 1000)
+    return percentiles(values)
+
+
+def brute_force_recall(index, graph, rows):
+    # Share of graph neighbours scoring at least the true k-th best cosine
+    # (float16 scores, so ties within rounding count as found)
+    hits = 0
+    for row in rows:
+        scores = index.embeddings @ index.embeddings[row]
+        scores[row] = -np.inf
+        kth = np.partition(scores, -graph.k)[-graph.k]
+        found = index.embeddings[np.asarray(graph.neighbors[row])] @ index.embeddings[row]
+        hits += int((found >= kth - 1e-3).sum())
+    return hits / (len(rows) * graph.k)
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    catalog, embed_time = timed(embed_catalog, make_catalog(args.catalog_size, seed=args.seed), FakeEmbeddingModel())
+    print(f"Synthetic catalog: {len(catalog):,} games embedded in {embed_time:.1f}s")
+    report = {"config": vars(args)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        LocalVectorIndex.from_collection(FakeCollection(catalog)).save(tmp)
+        index = LocalVectorIndex.load(tmp)  # memory-mapped, as similar_games.py reads it
+
+        tracemalloc.start()
+        graph, build_time = timed(SimilarGames.build, index, k=args.k, block_size=args.block_size)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        graph.save(tmp)
+        graph = SimilarGames.load(tmp)
+        graph_bytes = graph.neighbors.nbytes + graph.scores.nbytes
+        print(f"Graph: k={graph.k} for {len(graph):,} games in {build_time:.1f}s, peak {peak / 1e6:.0f} MB allocated "
+              f"(a full score matrix would be {len(index) ** 2 * 4 / 1e6:,.0f} MB), {graph_bytes / 1e6:.1f} MB on disk")
+
+        sample = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+        recall = brute_force_recall(index, graph, sample[:args.recall_sample])
+        print(f"Recall against brute force on {min(args.recall_sample, len(sample))} games: {recall:.4f}")
+
+        # What a "more like this" follow-up costs on each path
+        embedding_model = EmbeddingModelSentence(FakeEmbeddingModel(), cache_size=0)
+        names = [index.metadata["name"][i] for i in sample]
+        games = [index.row(i) for i in sample]
+        handler = DataHandler(None, None, embedding_model, index, similar_index=graph)
+        filters = {"price_limit": 20, "review_sentiment": "Positive"}
+        paths = {
+            "graph": latencies(lambda name: handler.similar_games(name), names),
+            "graph_filtered": latencies(lambda name: handler.similar_games(name, **filters), names),
+            "embed_and_search": latencies(lambda game: handler.smart_vector_search(
+                f"{game['name']} {game['description']}", None), games),
+            "embed_and_search_filtered": latencies(lambda game: handler.smart_vector_search(
+                f"{game['name']} {game['description']}", None, **filters), games),
+        }
+        for name, stats in paths.items():
+            print(f"{name:<26} p50 {stats['p50_ms'] * 1000:>10.1f} us  p99 {stats['p99_ms'] * 1000:>10.1f} us")
+
+        # The follow-up resolved from the chat history, no routing or reflection call
+        history = ChatHistory()
+        history.add_user("cozy farming games")
+        history.record_retrieval(games[:3], {"price_limit": 30})
+        history.add_assistant("")
+        model_response = ModelResponse(None, client=object(), similar_index=graph)
+        matches = model_response.match_similar("something like the second one", history)
+        ok = recall >= 0.99 and len(matches) == 3 and all(m["price_value"] <= 30 for m in matches)
+        print(f"Follow-up 'something like the second one' -> {[m['name'] for m in matches]}: {'OK' if ok else 'FAILED'}")
+
+        report.update(games=len(graph), build_s=round(build_time, 2), peak_mb=round(peak / 1e6, 1),
+                      graph_mb=round(graph_bytes / 1e6, 2), recall=round(recall, 4), latency=paths)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the similar-games graph on a synthetic catalog and time lookups")
+    parser.add_argument("--catalog-size", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=30)
+    parser.add_argument("--block-size", type=int, default=2048)
+    parser.add_argument("--queries", type=int, default=1000, help="Games looked up per path")
+    parser.add_argument("--recall-sample", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.similar_games_benchmark --catalog-size 50000
+    sys.exit(0 if run(parse_args()) else 1)
@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+
+
+def clip(text, max_chars):
+    text = " ".join(str(text or "").split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1].rsplit(" ", 1)[0] + "…"
+
+
+class ChatHistory:
+    # Conversation memory for the Reflection and planner prompts, bounded no
+    # matter how long the session runs:
+    # - the last window_turns turns verbatim, except that assistant answers
+    #   are compressed to the games they recommended
+    # - a rolling summary: the requests of older turns, folded in one by one
+    #   as they leave the window, keeping the newest max_summary_requests
+    # - structured state: the active search filters and the games already
+    #   recommended
+    def __init__(self, window_turns=3, max_summary_requests=6, max_recommended=15, max_message_chars=200):
+        self.window_turns = window_turns
+        self.max_message_chars = max_message_chars
+        self.max_recommended = max_recommended
+        self.turns = deque()
+        self.summary = deque(maxlen=max_summary_requests)
+        self.filters = {}
+        self.recommended = []
+        # Games of the latest answer that had any, in order, for "like the second one"
+        self.last_games = []
+        self.messages = 0
+        self._user = None
+        self._games = None
+        # Turns of one session run one at a time, each needs the previous answer
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.messages
+
+    def add_user(self, content):
+        self._user = clip(content, self.max_message_chars)
+        self._games = None
+        self.messages += 1
+
+    def record_retrieval(self, games, filters=None):
+        # Passed to stream_response as on_retrieval: the games the answer is built from
+        self._games = [g.get("name") for g in games or [] if isinstance(g, dict) and g.get("name")]
+        if filters is not None:
+            self.filters = {name: value for name, value in filters.items() if value is not None and name != "query"}
+
+    def add_assistant(self, content):
+        if self._games:
+            reply = f"recommended {', '.join(self._games)}"
+            self.last_games = self._games
+            for name in self._games:
+                if name in self.recommended:
+                    self.recommended.remove(name)
+                self.recommended.append(name)
+            del self.recommended[:-self.max_recommended]
+        else:
+            # Small talk or no results: a short excerpt is enough
+            reply = clip(content, self.max_message_chars)
+        self.turns.append((self._user or "", reply))
+        self._user = None
+        self._games = None
+        self.messages += 1
+        while len(self.turns) > self.window_turns:
+            user, _ = self.turns.popleft()
+            if user:
+                self.summary.append(clip(user, self.max_message_chars // 2))
+
+    def to_prompt(self):
+        lines = []
+        if self.summary:
+            lines.append(f"Earlier the user asked for: {'; '.join(self.summary)}\n")
+        if self.recommended:
+            lines.append(f"Games already recommended: {', '.join(self.recommended)}\n")
+        if self.filters:
+            lines.append(f"Active filters: {', '.join(f'{name}={value}' for name, value in self.filters.items())}\n")
+        for user, assistant in self.turns:
+            lines.append(f"user: {user}\n")
+            lines.append(f"assistant: {assistant}\n")
+        return ''.join(lines)
@@ -0,0 +1,73 @@
+import re
+
+
+# Gemini tokenizes English at roughly four characters per token; counting
+# exactly would cost a count_tokens round trip per prompt
+CHARS_PER_TOKEN = 4
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def shorten(text, max_tokens):
+    # Keeps the leading sentences that fit; cuts the first one at a word
+    # boundary when even it is too long
+    text = " ".join(str(text or "").split())
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    kept = ""
+    for sentence in SENTENCE_END.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+    if kept:
+        return kept
+    cut = text[:max(max_chars - 1, 0)].rsplit(" ", 1)[0]
+    return f"{cut}…" if cut else ""
+
+
+def game_line(game, description):
+    return (f"{game.get('name')}: {description}: {game.get('all_reviews')}: {game.get('release_date')}: "
+            f"{game.get('publisher')}: {game.get('price')}")
+
+
+def build_context(games, token_budget=None):
+    # One line per game in ranking order. With a budget, descriptions share
+    # what is left after the fixed fields: short ones stay whole and the rest
+    # split the remainder evenly. Lowest-ranked games are dropped when even
+    # their fixed fields do not fit.
+    games = [g for g in games if isinstance(g, dict)]
+    if token_budget is None:
+        return "\n".join(game_line(g, g.get("description")) for g in games)
+
+    fixed = [estimate_tokens(game_line(g, "")) + 1 for g in games]
+    while len(games) > 1 and sum(fixed) > token_budget:
+        games.pop()
+        fixed.pop()
+
+    remaining = max(token_budget - sum(fixed), 0)
+    needs = [estimate_tokens(" ".join(str(g.get("description") or "").split())) for g in games]
+    allowance = [0] * len(games)
+    for left, i in enumerate(sorted(range(len(games)), key=lambda i: needs[i])):
+        share = remaining // (len(games) - left)
+        allowance[i] = min(needs[i], share)
+        remaining -= allowance[i]
+
+    return "\n".join(game_line(g, shorten(g.get("description"), allowance[i])) for i, g in enumerate(games))
+
+
+RETRIEVAL_ONLY_INTRO = "I can't reach the recommendation model right now, but these games match your request:"
+
+
+def retrieval_only_answer(games, description_tokens=40):
+    # Served when Gemini is unavailable: the retrieved games as a plain list
+    lines = [RETRIEVAL_ONLY_INTRO, ""]
+    for g in games:
+        if isinstance(g, dict):
+            lines.append(f"- **{g.get('name')}**: {shorten(g.get('description'), description_tokens)} "
+                         f"({g.get('all_reviews')}, released {g.get('release_date')}, {g.get('publisher')}, {g.get('price')})")
+    return "\n".join(lines)
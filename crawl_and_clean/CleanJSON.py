@@ -1,67 +1,85 @@
+import argparse
 import json
 import re
+from itertools import islice
 
-# Load the JSON file
-with open("download.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Extract app list
-apps = data["applist"]["apps"]
-
-# Function to check if text contains non-ASCII characters
-def is_non_english(text):
-    return any(ord(char) > 127 for char in text)  # ASCII only goes up to 127
-
-# Function to check if text contains emojis
-def contains_emoji(text):
-    emoji_pattern = re.compile(
-        "[\U0001F600-\U0001F64F"  # Emoticons
-        "\U0001F300-\U0001F5FF"  # Symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # Transport & map symbols
-        "\U0001F700-\U0001F77F"  # Alchemical symbols
-        "\U0001F780-\U0001F7FF"  # Geometric shapes
-        "\U0001F800-\U0001F8FF"  # Supplemental arrows
-        "\U0001F900-\U0001F9FF"  # Supplemental symbols and pictographs
-        "\U0001FA00-\U0001FA6F"  # Chess symbols
-        "\U0001FA70-\U0001FAFF"  # Symbols and pictographs extended
-        "\U00002702-\U000027B0"  # Dingbats
-        "\U000024C2-\U0001F251"
-        "]+", flags=re.UNICODE
-    )
-    return bool(emoji_pattern.search(text))
-
-# Filtering unwanted apps
-filtered_apps = [
-    app for app in apps
-    if app.get("name")  # Has a valid name
-    and not any(keyword in app["name"].lower() for keyword in [
-        "demo", "trailer", "soundtrack", "wallpaper", "theme", "bundle",
-        "collection", "season pass", "upgrade", "dlc", "expansion", "episode",
-        "chapter", "mod", "patch", "update", "fix", "guide", "manual",
-        "tutorial", "walkthrough", "review", "faq", "interview","vr","edition",
-        "#","pack","season","seasons",
-        "beta","server","test","tool","tools","test","content","extra","mv","movie",
-        "film","series","ost","kit","soundtrack","editor","editors","shader","shaders","render","renders",
-        "resource","resources","asset","assets","support","advanced","pro","lite","free","pack","packs",
-    ])  # Remove unwanted types
-    and not is_non_english(app["name"])  # Remove non-English names
-    and not contains_emoji(app["name"])  # Remove emoji-containing names
+import ijson
+
+# Unwanted app types, matched as substrings of the lowercased name
+KEYWORDS = [
+    "demo", "trailer", "soundtrack", "wallpaper", "theme", "bundle",
+    "collection", "season pass", "upgrade", "dlc", "expansion", "episode",
+    "chapter", "mod", "patch", "update", "fix", "guide", "manual",
+    "tutorial", "walkthrough", "review", "faq", "interview","vr","edition",
+    "#","pack","season","seasons",
+    "beta","server","test","tool","tools","test","content","extra","mv","movie",
+    "film","series","ost","kit","soundtrack","editor","editors","shader","shaders","render","renders",
+    "resource","resources","asset","assets","support","advanced","pro","lite","free","pack","packs",
 ]
 
-# Remove duplicates by keeping only unique names
-seen = set()
-unique_apps = []
-for app in filtered_apps:
-    name_lower = app["name"].lower()
-    if name_lower not in seen:
+# Anything outside ASCII (which covers every emoji range) or any keyword
+# rejects a name. The ASCII check runs on the original name, since lower()
+# folds some non-ASCII letters into ASCII (the Kelvin sign into "k")
+NON_ASCII_PATTERN = re.compile("[^\x00-\x7f]")
+KEYWORD_PATTERN = re.compile("|".join(re.escape(k) for k in sorted(set(KEYWORDS), key=len, reverse=True)))
+
+
+def is_wanted(name):
+    return bool(name) and not NON_ASCII_PATTERN.search(name) and not KEYWORD_PATTERN.search(name.lower())
+
+
+def iter_apps(path="download.json"):
+    # Streams applist.apps one entry at a time instead of json.load-ing the file
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "applist.apps.item")
+
+
+def clean_apps(apps):
+    # Filters and dedups (first name wins, case-insensitive) in a single pass
+    seen = set()
+    for app in apps:
+        name = app.get("name")
+        if not is_wanted(name):
+            continue
+        name_lower = name.lower()
+        if name_lower in seen:
+            continue
         seen.add(name_lower)
-        unique_apps.append(app)
+        yield {"appid": app["appid"], "name": name}
+
+
+def write_app_list(apps, path="cleaned_steam_apps.json"):
+    # Writes {"applist": {"apps": [...]}} one app per line as they arrive
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"applist": {"apps": [')
+        for app in apps:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(app))
+            count += 1
+        f.write("\n]}}\n")
+    return count
+
+
+def iter_app_ids(path="cleaned_steam_apps.json", limit=None):
+    return islice((app["appid"] for app in iter_apps(path)), limit)
+
+
+def clean_app_list(input_path="download.json", output_path="cleaned_steam_apps.json", sort=True):
+    apps = clean_apps(iter_apps(input_path))
+    if sort:
+        # Only the kept apps are buffered for the appid sort
+        apps = sorted(apps, key=lambda x: x["appid"])
+    return write_app_list(apps, output_path)
 
-# Sort alphabetically
-unique_apps.sort(key=lambda x: x["appid"])
 
-# Save the cleaned data
-with open("cleaned_steam_apps.json", "w", encoding="utf-8") as f:
-    json.dump({"applist": {"apps": unique_apps}}, f, indent=4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter the Steam app list down to unique, English game names")
+    parser.add_argument("--input", default="download.json")
+    parser.add_argument("--output", default="cleaned_steam_apps.json")
+    parser.add_argument("--no-sort", dest="sort", action="store_false",
+                        help="Keep input order and stream straight to the output")
+    args = parser.parse_args()
 
-print(f"Cleaned list saved as cleaned_steam_apps.json with {len(unique_apps)} unique entries.")
+    count = clean_app_list(args.input, args.output, sort=args.sort)
+    print(f"Cleaned list saved as {args.output} with {count} unique entries.")
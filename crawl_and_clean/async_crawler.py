@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from CrawlDataSteam import empty_result, headers, load_app_ids, parse_app_page, timestamped_filename
+from crawl_state import CrawlCheckpoint
+from store_parser import parse_app_page_fast
+
+
+STORE_URL = "https://store.steampowered.com"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value, default=5.0):
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    # AIMD token bucket: the rate grows by about `increase` requests/s for every
+    # second without throttling and halves on a 429, once per Retry-After
+    # window, which also pauses every request to the host. The burst stays
+    # `burst / rate` seconds' worth of requests as the rate moves.
+    def __init__(self, rate, burst=None, min_rate=0.5, max_rate=None, increase=1.0):
+        self.rate = rate
+        self.burst_seconds = (burst / rate) if burst else 1.0
+        self.burst = max(1.0, rate * self.burst_seconds)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 4
+        self.increase = increase
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _set_rate(self, rate):
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.burst = max(1.0, self.rate * self.burst_seconds)
+        self.tokens = min(self.tokens, self.burst)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        # Successes arrive `rate` times a second, so each adds increase / rate
+        self._set_rate(self.rate + self.increase / self.rate)
+
+    def on_throttle(self, retry_after):
+        # The other 429s of the same burst land inside the window the first
+        # one opened and do not halve the rate again
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return
+        self._set_rate(self.rate / 2)
+        # Start refilling from an empty bucket when the pause ends, not with
+        # the tokens the pause itself would have accrued
+        self.tokens = 0
+        self.blocked_until = self.updated = now + retry_after
+
+
+class HostRateLimiter:
+    def __init__(self, rate, **bucket_options):
+        self.rate = rate
+        self.bucket_options = bucket_options
+        self.buckets = {}
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, **self.bucket_options)
+        return self.buckets[host]
+
+
+class AsyncCrawler:
+    def __init__(self, base_url=STORE_URL, concurrency=20, rate=10.0, pool_size=None, max_retries=4,
+                 timeout=15, parser=parse_app_page_fast, parse_executor=None):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.pool_size = pool_size or concurrency
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limiter = HostRateLimiter(rate)
+        # Parsing is CPU-bound: pass a ProcessPoolExecutor to keep it off the
+        # event loop and the GIL; None uses the loop's default thread pool
+        self.parser = parser
+        self.parse_executor = parse_executor
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    async def fetch_page(self, session, app_id):
+        url = f"{self.base_url}/app/{app_id}/"
+        bucket = self.limiter.bucket(url)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status in RETRY_STATUSES:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"), default=2 ** attempt)
+                        if response.status == 429:
+                            self.stats["throttled"] += 1
+                            bucket.on_throttle(retry_after)
+                        elif attempt < self.max_retries:
+                            await asyncio.sleep(retry_after)
+                        continue
+                    response.raise_for_status()
+                    bucket.on_success()
+                    return await response.read()
+            except aiohttp.ClientResponseError:
+                # 404 and other statuses outside RETRY_STATUSES will not change on retry
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # Connection errors, resets and timeouts, as urllib3's Retry did in CrawlDataSteam.py
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+        raise aiohttp.ClientError(f"Gave up after {self.max_retries + 1} attempts")
+
+    async def fetch_app_data(self, session, app_id):
+        try:
+            content = await self.fetch_page(session, app_id)
+        except asyncio.TimeoutError as e:
+            self.stats["errors"] += 1
+            print(f"Timeout after retries: {app_id} - {e}")
+            return empty_result(app_id)
+        except aiohttp.ClientError as e:
+            self.stats["errors"] += 1
+            print(f"Other error: {app_id} - {e}")
+            return empty_result(app_id)
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.parse_executor, self.parser, app_id, content)
+        print(f"Success: {app_id} - {result['name']}")
+        return result
+
+    async def crawl(self, app_ids, on_result=None):
+        queue = asyncio.Queue()
+        for app_id in app_ids:
+            queue.put_nowait(app_id)
+        results = []
+
+        async def worker(session):
+            while True:
+                try:
+                    app_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await self.fetch_app_data(session, app_id)
+                except Exception as e:
+                    print(f"Exception for app ID {app_id}: {e}")
+                    continue
+                if on_result is not None:
+                    on_result(result)
+                else:
+                    results.append(result)
+
+        connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            await asyncio.gather(*(worker(session) for _ in range(self.concurrency)))
+        return results
+
+    def run(self, app_ids, on_result=None):
+        return asyncio.run(self.crawl(app_ids, on_result))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl Steam store pages with asyncio")
+    parser.add_argument("--apps", default="cleaned_steam_apps.json")
+    parser.add_argument("--limit", type=int, default=50000)
+    parser.add_argument("--base-url", default=STORE_URL, help="e.g. http://127.0.0.1:8080 for fake_store.py")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--pool-size", type=int, default=None, help="Max open connections (default: concurrency)")
+    parser.add_argument("--rate", type=float, default=10.0, help="Initial requests per second per host")
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--parse-workers", type=int, default=2, help="Parser processes (0 parses on a thread pool)")
+    parser.add_argument("--legacy-parser", action="store_true", help="Use the BeautifulSoup parser")
+    parser.add_argument("--output", default="steam_game_descriptions.jsonl", help="Append-only JSONL checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry apps that failed before")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch apps that are new or older than --max-age-days")
+    parser.add_argument("--max-age-days", type=float, default=7)
+    parser.add_argument("--csv", action="store_true", help="Export the latest record per app to a timestamped CSV")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    parse_executor = ProcessPoolExecutor(max_workers=args.parse_workers) if args.parse_workers else None
+    crawler = AsyncCrawler(base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+                           pool_size=args.pool_size, max_retries=args.max_retries,
+                           parser=parse_app_page if args.legacy_parser else parse_app_page_fast,
+                           parse_executor=parse_executor)
+    checkpoint = CrawlCheckpoint(args.output)
+    app_ids = load_app_ids(args.apps, args.limit)
+    if args.incremental:
+        app_ids = checkpoint.stale(app_ids, args.max_age_days, retry_failed=args.retry_failed)
+    else:
+        app_ids = checkpoint.pending(app_ids, retry_failed=args.retry_failed)
+    print(f"{len(app_ids)} apps to crawl")
+
+    started = time.perf_counter()
+    with checkpoint:
+        crawler.run(app_ids, on_result=checkpoint.record)
+    elapsed = time.perf_counter() - started
+    print(f"Fetched {len(app_ids)} pages in {elapsed:.1f}s ({len(app_ids) / max(elapsed, 1e-9):.1f}/s), stats: {crawler.stats}")
+    if parse_executor is not None:
+        parse_executor.shutdown()
+    if args.csv:
+        checkpoint.export_csv(timestamped_filename())
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from CleanJSON import KEYWORDS, clean_app_list
+
+WORDS = ["dark", "star", "quest", "legend", "city", "space", "hero", "tower", "shadow", "rogue",
+         "farm", "racing", "dungeon", "island", "war", "puzzle", "knight", "zero", "ghost", "sky"]
+NOISE = KEYWORDS[:20] + ["Ünïcode", "游戏", "\U0001F600", "Demo", "SOUNDTRACK"]
+
+
+def write_synthetic_app_list(path, size, seed=0):
+    # Shaped like download.json: mostly plain names, some rejected ones and
+    # case-only duplicates, in shuffled appid order
+    rng = random.Random(seed)
+    appids = list(range(10, 10 + size * 10, 10))
+    rng.shuffle(appids)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"applist": {"apps": [')
+        for i, appid in enumerate(appids):
+            name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+            roll = rng.random()
+            if roll < 0.3:
+                name += " " + rng.choice(NOISE)
+            elif roll < 0.35:
+                name = ""
+            elif roll < 0.45:
+                name = name.upper()
+            f.write(("," if i else "") + json.dumps({"appid": appid, "name": name}, ensure_ascii=False))
+        f.write("]}}")
+
+
+def legacy_clean(input_path, output_path):
+    # The original CleanJSON script, kept here as the reference output
+    with open(input_path, "r", encoding="utf-8") as f:
+        apps = json.load(f)["applist"]["apps"]
+
+    def is_non_english(text):
+        return any(ord(char) > 127 for char in text)
+
+    def contains_emoji(text):
+        emoji_pattern = re.compile(
+            "[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F"
+            "\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F"
+            "\U0001FA70-\U0001FAFF\U00002702-\U000027B0\U000024C2-\U0001F251]+", flags=re.UNICODE
+        )
+        return bool(emoji_pattern.search(text))
+
+    filtered_apps = [
+        app for app in apps
+        if app.get("name")
+        and not any(keyword in app["name"].lower() for keyword in KEYWORDS)
+        and not is_non_english(app["name"])
+        and not contains_emoji(app["name"])
+    ]
+    seen = set()
+    unique_apps = []
+    for app in filtered_apps:
+        name_lower = app["name"].lower()
+        if name_lower not in seen:
+            seen.add(name_lower)
+            unique_apps.append(app)
+    unique_apps.sort(key=lambda x: x["appid"])
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"applist": {"apps": unique_apps}}, f, indent=4)
+    return len(unique_apps)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def load_output(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["applist"]["apps"]
+
+
+if __name__ == "__main__":
+    # python clean_benchmark.py --size 500000
+    parser = argparse.ArgumentParser(description="Compare the legacy and streaming app list cleaners")
+    parser.add_argument("--size", type=int, default=200000, help="Apps in the synthetic download.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "download.json")
+        write_synthetic_app_list(source, args.size, args.seed)
+        print(f"Synthetic app list: {args.size} apps, {os.path.getsize(source) / 1e6:.1f} MB")
+
+        legacy_path = os.path.join(tmp, "legacy.json")
+        streaming_path = os.path.join(tmp, "streaming.json")
+        legacy_count, legacy_time = timed(legacy_clean, source, legacy_path)
+        streaming_count, streaming_time = timed(clean_app_list, source, streaming_path)
+
+        same = load_output(legacy_path) == load_output(streaming_path)
+        print(f"Legacy:    {legacy_count} apps in {legacy_time:.2f}s ({args.size / legacy_time:,.0f} apps/s)")
+        print(f"Streaming: {streaming_count} apps in {streaming_time:.2f}s ({args.size / streaming_time:,.0f} apps/s, "
+              f"{legacy_time / streaming_time:.1f}x)")
+        print(f"Outputs identical: {'OK' if same else 'FAILED'}")
+
+    sys.exit(0 if same else 1)
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+
+DAY = 24 * 60 * 60
+
+
+def read_jsonl(path):
+    # A crash can leave a half-written last line; skip anything unparsable
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class CrawlCheckpoint:
+    # Results are appended to a JSONL file as they arrive, and a second
+    # append-only log records which app_ids are done or failed and when.
+    def __init__(self, output_path="steam_game_descriptions.jsonl", state_path=None):
+        self.output_path = output_path
+        self.state_path = state_path or os.path.splitext(output_path)[0] + ".state.jsonl"
+        self.done = {}
+        self.failed = {}
+        self._output = None
+        self._state = None
+        self.load()
+
+    def load(self):
+        for entry in read_jsonl(self.state_path):
+            app_id, status, at = entry.get("app_id"), entry.get("status"), entry.get("at", 0)
+            if status == "done":
+                self.done[app_id] = at
+                self.failed.pop(app_id, None)
+            elif status == "failed" and app_id not in self.done:
+                self.failed[app_id] = at
+        print(f"Checkpoint: {len(self.done)} done, {len(self.failed)} failed")
+
+    def open(self):
+        if self._output is None:
+            self._output = open(self.output_path, "a", encoding="utf-8")
+            self._state = open(self.state_path, "a", encoding="utf-8")
+        return self
+
+    def close(self):
+        if self._output is not None:
+            self._output.close()
+            self._state.close()
+            self._output = self._state = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, result):
+        self.open()
+        now = time.time()
+        app_id = result["app_id"]
+        status = "done" if result.get("name") else "failed"
+        if status == "done":
+            self._output.write(json.dumps(dict(result, fetched_at=now)) + "\n")
+            self._output.flush()
+            self.done[app_id] = now
+            self.failed.pop(app_id, None)
+        else:
+            self.failed[app_id] = now
+        self._state.write(json.dumps({"app_id": app_id, "status": status, "at": now}) + "\n")
+        self._state.flush()
+
+    def pending(self, app_ids, retry_failed=False):
+        # Resume: everything not done yet, optionally retrying failures
+        return [a for a in app_ids if a not in self.done and (retry_failed or a not in self.failed)]
+
+    def stale(self, app_ids, max_age_days=7, retry_failed=True):
+        # Incremental refresh: apps new in the app list or fetched too long ago
+        cutoff = time.time() - max_age_days * DAY
+        return [
+            a for a in app_ids
+            if (a in self.done and self.done[a] < cutoff)
+            or (a not in self.done and (retry_failed or a not in self.failed))
+        ]
+
+    def export_csv(self, path):
+        # Latest record per app_id, in the same columns as the CSV crawl output
+        data = pd.DataFrame(list(read_jsonl(self.output_path)))
+        if not data.empty:
+            data = data.drop_duplicates(subset="app_id", keep="last").drop(columns=["fetched_at"])
+        data.to_csv(path, index=False)
+        print(f"Exported {len(data)} games to {path}")
+        return path
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import re
+import time
+
+from aiohttp import web
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "store_pages")
+
+
+def load_pages(directory=FIXTURES_DIR):
+    pages = {}
+    for filename in os.listdir(directory):
+        app_id, ext = os.path.splitext(filename)
+        if ext == ".html" and app_id.isdigit():
+            with open(os.path.join(directory, filename), "rb") as f:
+                pages[int(app_id)] = f.read()
+    return pages
+
+
+class FakeStore:
+    # Local stand-in for store.steampowered.com/app/<id>/ that serves recorded
+    # pages, simulates latency and answers 429 + Retry-After above its rate.
+    def __init__(self, pages, rate=None, latency=0.0, synthesize=True, retry_after=1):
+        self.pages = pages
+        self.rate = rate
+        self.latency = latency
+        self.synthesize = synthesize
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._template = pages[min(pages)] if pages else None
+
+    def page_for(self, app_id):
+        if app_id in self.pages:
+            return self.pages[app_id]
+        if not self.synthesize or self._template is None:
+            return None
+        # Unknown ids get the first recorded page with a unique name
+        return re.sub(rb'(id="appHubAppName">)[^<]*', rb"\g<1>Synthetic Game " + str(app_id).encode(), self._template)
+
+    def _over_rate(self):
+        if not self.rate:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        return self._window_count > self.rate
+
+    async def handle_app(self, request):
+        self.requests += 1
+        if self._over_rate():
+            self.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        page = self.page_for(int(request.match_info["app_id"]))
+        if page is None:
+            return web.Response(status=404)
+        return web.Response(body=page, content_type="text/html")
+
+    async def handle_stats(self, request):
+        return web.json_response({"requests": self.requests, "throttled": self.throttled})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/app/{app_id:\\d+}/", self.handle_app)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+async def start_store(store, host="127.0.0.1", port=8080):
+    runner = web.AppRunner(store.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+if __name__ == "__main__":
+    # python fake_store.py --port 8080 --rate 50 --latency 0.2
+    parser = argparse.ArgumentParser(description="Serve recorded Steam store pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pages", default=FIXTURES_DIR)
+    parser.add_argument("--rate", type=float, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each page")
+    parser.add_argument("--no-synthesize", dest="synthesize", action="store_false")
+    args = parser.parse_args()
+
+    store = FakeStore(load_pages(args.pages), rate=args.rate, latency=args.latency, synthesize=args.synthesize)
+    web.run_app(store.make_app(), host=args.host, port=args.port)
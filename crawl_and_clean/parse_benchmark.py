@@ -0,0 +1,89 @@
+import argparse
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from CrawlDataSteam import parse_app_page
+from fake_store import FakeStore, load_pages
+from store_parser import parse_app_page_fast
+
+
+# What each recorded page in fixtures/store_pages covers
+FIXTURE_CASES = {
+    570: "free to play, price only in the purchase countdown",
+    620: "regular price, developer also in the glance block",
+    730: "free to play without a price div, no recent reviews row",
+    1091500: "discounted main price, full price in a second purchase block",
+    1174180: "age gate instead of the store page",
+    2000010: "no review tooltips, developer as plain text, no publisher, VND price, non-ASCII name",
+    2000020: "only a recent reviews row, no developer or publisher labels, no price",
+    2000030: "removed app redirected to the store front page",
+}
+
+
+def check_equivalence(pages):
+    # The fast parser must reproduce the BeautifulSoup output field for field,
+    # including fields only one of them returns
+    mismatches = []
+    for app_id, content in sorted(pages.items()):
+        expected = parse_app_page(app_id, content)
+        actual = parse_app_page_fast(app_id, content)
+        for field in sorted(set(expected) | set(actual)):
+            if expected.get(field) != actual.get(field):
+                mismatches.append((app_id, field, expected.get(field), actual.get(field)))
+    return mismatches
+
+
+def time_parser(parser, pages, repeat):
+    items = list(pages.items())
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for app_id, content in items:
+            parser(app_id, content)
+    elapsed = time.perf_counter() - started
+    return len(items) * repeat / elapsed
+
+
+def time_process_pool(parser, pages, workers):
+    app_ids, contents = zip(*pages.items())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(parser, app_ids[:workers], contents[:workers]))  # warm up workers
+        started = time.perf_counter()
+        list(executor.map(parser, app_ids, contents, chunksize=16))
+        elapsed = time.perf_counter() - started
+    return len(app_ids) / elapsed
+
+
+if __name__ == "__main__":
+    # python parse_benchmark.py --pages 2000 --workers 4
+    parser = argparse.ArgumentParser(description="Compare the BeautifulSoup and lxml store page parsers")
+    parser.add_argument("--pages", type=int, default=1000, help="Synthetic pages for the throughput runs")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the recorded fixtures")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)
+
+    fixtures = load_pages()
+    mismatches = check_equivalence(fixtures)
+    for app_id, field, expected, actual in mismatches:
+        print(f"MISMATCH {app_id}.{field}: {expected!r} != {actual!r}")
+    failed = {app_id for app_id, *_ in mismatches}
+    for app_id in sorted(fixtures):
+        print(f"  {app_id}: {FIXTURE_CASES.get(app_id, 'recorded page')} {'FAILED' if app_id in failed else 'OK'}")
+    missing = set(FIXTURE_CASES) - set(fixtures)
+    if missing:
+        print(f"Missing fixtures: {sorted(missing)}")
+    print(f"Equivalence on {len(fixtures)} recorded pages: {'FAILED' if mismatches or missing else 'OK'}")
+
+    store = FakeStore(fixtures)
+    synthetic = {app_id: store.page_for(app_id) for app_id in range(1, args.pages + 1)}
+
+    legacy = time_parser(parse_app_page, fixtures, args.repeat)
+    fast = time_parser(parse_app_page_fast, fixtures, args.repeat)
+    print(f"Single process: BeautifulSoup {legacy:.0f} pages/s, lxml {fast:.0f} pages/s ({fast / legacy:.1f}x)")
+
+    pooled = time_process_pool(parse_app_page_fast, synthetic, args.workers)
+    print(f"Process pool ({args.workers} workers, {len(synthetic)} pages): lxml {pooled:.0f} pages/s")
+
+    sys.exit(1 if mismatches or missing else 0)
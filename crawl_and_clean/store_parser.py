@@ -0,0 +1,100 @@
+from lxml import html
+
+from CrawlDataSteam import empty_result
+
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+# Each query only touches the block it needs instead of walking a full soup
+XPATHS = {
+    "name": html.etree.XPath('//div[@id="appHubAppName"]'),
+    "tags": html.etree.XPath(f'//a[{_has_class("app_tag")}]'),
+    "popular_tags_div": html.etree.XPath(f'//div[{_has_class("glance_tags")} and {_has_class("popular_tags")}]'),
+    "app_tags": html.etree.XPath(f'.//a[{_has_class("app_tag")}]'),
+    "review_rows": html.etree.XPath(f'//div[@id="userReviews"]//div[{_has_class("user_reviews_summary_row")}]'
+                                    f'[@data-tooltip-html]'),
+    "review_summary": html.etree.XPath(f'.//span[{_has_class("game_review_summary")}]'),
+    "date": html.etree.XPath(f'//div[{_has_class("date")}]'),
+    "details_labels": html.etree.XPath(f'//*[{_has_class("details_block")}]//b'),
+    "next_link": html.etree.XPath('following::a[1]'),
+    "price": html.etree.XPath(f'//div[{_has_class("game_purchase_price")}]'),
+    "free_to_play": html.etree.XPath('//text()[. = "Free to Play"]'),
+    "description": html.etree.XPath(f'//div[{_has_class("game_description_snippet")}]'),
+}
+
+
+def _first_text(elements):
+    return elements[0].text_content().strip() if elements else None
+
+
+def _labelled_link(labels, label):
+    for b in labels:
+        if label in b.text_content():
+            links = XPATHS["next_link"](b)
+            return links[0].text_content().strip() if links else None
+    return None
+
+
+def parse_app_page_fast(app_id, content):
+    # Same output as CrawlDataSteam.parse_app_page, built on lxml
+    if not content:
+        return empty_result(app_id)
+    # Steam serves UTF-8; decoding up front avoids lxml's latin-1 default for bytes
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    doc = html.fromstring(content)
+
+    # Name
+    name = _first_text(XPATHS["name"](doc))
+
+    # Tags (first 3) and popular tags (all)
+    tags = [t.text_content().strip() for t in XPATHS["tags"](doc)[:3]] if name else []
+    popular_tags_div = XPATHS["popular_tags_div"](doc)
+    popular_tags = [t.text_content().strip() for t in XPATHS["app_tags"](popular_tags_div[0])] if popular_tags_div else []
+
+    # User Reviews
+    all_reviews = None
+    all_percent = None
+    all_count = None
+    for row in XPATHS["review_rows"](doc):
+        tooltip = row.get("data-tooltip-html")
+        if not tooltip or "last 30 days" in tooltip:
+            continue
+        all_reviews = _first_text(XPATHS["review_summary"](row))
+        parts = tooltip.split(" of the ")
+        all_percent = parts[0].strip() if parts else None
+        all_count = parts[1].split(" user")[0].replace(",", "") if len(parts) > 1 else None
+        break
+
+    # Release Date
+    release_date = _first_text(XPATHS["date"](doc))
+
+    # Developer and Publisher
+    labels = XPATHS["details_labels"](doc)
+    developer = _labelled_link(labels, "Developer:")
+    publisher = _labelled_link(labels, "Publisher:")
+
+    # Price
+    price = _first_text(XPATHS["price"](doc))
+    if price is None and XPATHS["free_to_play"](doc):
+        price = "Free to Play"
+
+    # Description
+    description = _first_text(XPATHS["description"](doc))
+
+    return {
+        "app_id": app_id,
+        "name": name,
+        "tags": ",".join(tags),
+        "popular_tags": ",".join(popular_tags),
+        "all_reviews": all_reviews,
+        "all_percent": all_percent,
+        "all_count": all_count,
+        "release_date": release_date,
+        "developer": developer,
+        "publisher": publisher,
+        "price": price,
+        "description": description
+    }
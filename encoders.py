@@ -0,0 +1,179 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+ONNX_DIR = "onnx_encoder"
+ENCODER_BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+class OnnxEncoder:
+    # all-MiniLM-L6-v2 exported to ONNX Runtime: tokenizers + one session run,
+    # then the same mean pooling and L2 normalization SentenceTransformer applies.
+    # Exposes the SentenceTransformer encode() signature used by EmbeddingModelSentence.
+    def __init__(self, model_dir=ONNX_DIR, quantized=False, max_length=256, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = "model_int8.onnx" if quantized else "model.onnx"
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        encoded = np.vstack([self._encode_batch(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)])
+        encoded = encoded.astype(np.float32)
+        return encoded[0] if single else encoded
+
+
+class MicroBatchEncoder:
+    # Merges concurrent encode() calls from request threads into one forward
+    # pass. The first queued request opens a window of window_ms; everything
+    # queued by then (up to max_batch texts) is encoded together. While a pass
+    # runs, new requests pile up and form the next batch.
+    def __init__(self, encoder, max_batch=64, window_ms=5.0):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self._worker = threading.Thread(target=self._run, name="micro-batch-encoder", daemon=True)
+        self._worker.start()
+
+    def get_sentence_embedding_dimension(self):
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch or len(batch) >= self.max_batch or kwargs:
+            # Already a full batch (warmup, ingestion) or non-default options: encode directly
+            return self.encoder.encode(texts, batch_size=batch_size, **kwargs)
+        future = Future()
+        self.queue.put((batch, future))
+        encoded = future.result()
+        return encoded[0] if single else encoded
+
+    def _collect(self):
+        pending = [self.queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.window
+        while size < self.max_batch:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                encoded = np.asarray(self.encoder.encode(texts, batch_size=len(texts)), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for batch, future in pending:
+                # A copy, so callers caching their rows do not keep the whole batch alive
+                future.set_result(encoded[start:start + len(batch)].copy())
+                start += len(batch)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def load_encoder(backend="torch", model_name=DEFAULT_MODEL, onnx_dir=ONNX_DIR):
+    # Imports are deferred so only the selected backend's runtime gets loaded
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(onnx_dir, quantized=backend == "onnx-int8")
+    raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+
+
+def export_onnx(model_name=DEFAULT_MODEL, output_dir=ONNX_DIR, quantize=True, opset=17):
+    # One-off export; needs torch/transformers, the exported model only needs onnxruntime + tokenizers
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["warm up the encoder"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), model_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    print(f"Exported {repo} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Wrote dynamically quantized int8 model to {int8_path}")
+    return output_dir
+
+
+if __name__ == "__main__":
+    # python encoders.py --output onnx_encoder
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX Runtime")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--output", default=ONNX_DIR)
+    parser.add_argument("--no-quantize", dest="quantize", action="store_false", help="Skip the int8 variant")
+    args = parser.parse_args()
+    export_onnx(args.model, args.output, quantize=args.quantize)
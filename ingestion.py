@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from search_filters import normalize_game_fields
+from vector_index import GAME_FIELDS, to_vector
+
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def combine_game_fields(game):
+    # Same text the notebooks embedded: every game field joined by spaces
+    return " ".join(str(game.get(field, "")) for field in GAME_FIELDS)
+
+
+def content_hash(game, model_name=DEFAULT_MODEL):
+    # Changes whenever an embedded field or the embedding model changes
+    payload = json.dumps([model_name] + [game.get(field) for field in GAME_FIELDS], default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Process pool workers each load their own copy of the model once
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts, batch_size):
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class EmbeddingIngestor:
+    # Streams games from the source collection, embeds only the ones whose
+    # content hash changed, and upserts them into the target keyed by app_id.
+    def __init__(self, source, target=None, embedding_model=None, model_name=DEFAULT_MODEL, key="app_id",
+                 path="embedding", batch_size=256, write_batch_size=500, workers=0, vector_format="array"):
+        self.source = source
+        self.target = target if target is not None else source
+        self.embedding_model = embedding_model
+        self.model_name = model_name
+        self.key = key
+        self.path = path
+        self.batch_size = batch_size
+        self.write_batch_size = write_batch_size
+        self.workers = workers
+        self.vector_format = vector_format
+        self.stats = {"seen": 0, "unchanged": 0, "missing_key": 0, "embedded": 0, "upserted": 0, "modified": 0,
+                      "adopted": 0, "removed_keyless": 0}
+
+    def existing_hashes(self):
+        cursor = self.target.find({"content_hash": {"$exists": True}}, {"_id": 0, self.key: 1, "content_hash": 1},
+                                  batch_size=10000)
+        return {doc[self.key]: doc["content_hash"] for doc in cursor if self.key in doc}
+
+    def adopt_keyless(self):
+        # Documents the notebooks inserted before ingestion.py have no app_id.
+        # Each gets the app_id of the source game with the same name, so the
+        # upsert re-embeds it in place; the rest (duplicate names, games gone
+        # from the source) would sit next to the upserted copies and show up
+        # twice in $vectorSearch, so they are removed.
+        from pymongo import DeleteOne, UpdateOne
+
+        missing = {self.key: {"$exists": False}}
+        if self.target is self.source or not self.target.count_documents(missing, limit=1):
+            return
+        keys = {}
+        for game in self.source.find({}, {"_id": 0, "name": 1, self.key: 1}, batch_size=10000):
+            if game.get(self.key) is not None and game.get("name") is not None:
+                keys.setdefault(game["name"], game[self.key])
+        taken = set(self.target.distinct(self.key, {self.key: {"$exists": True}}))
+        updates = []
+        for doc in self.target.find(missing, {"_id": 1, "name": 1}, batch_size=10000):
+            key = keys.get(doc.get("name"))
+            if key is None or key in taken:
+                updates.append(DeleteOne({"_id": doc["_id"]}))
+                self.stats["removed_keyless"] += 1
+            else:
+                taken.add(key)
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {self.key: key}}))
+                self.stats["adopted"] += 1
+        if updates:
+            self.target.bulk_write(updates, ordered=False)
+        print(f"Keyless documents: {self.stats['adopted']} matched by name, {self.stats['removed_keyless']} removed")
+
+    def changed_games(self, force=False):
+        hashes = {} if force else self.existing_hashes()
+        cursor = self.source.find({}, {"_id": 0, self.path: 0}, batch_size=self.batch_size)
+        for game in cursor:
+            self.stats["seen"] += 1
+            if game.get(self.key) is None:
+                self.stats["missing_key"] += 1
+                continue
+            game["content_hash"] = content_hash(game, self.model_name)
+            if hashes.get(game[self.key]) == game["content_hash"]:
+                self.stats["unchanged"] += 1
+                continue
+            yield game
+
+    def batches(self, games):
+        batch = []
+        for game in games:
+            batch.append(game)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def encode(self, texts):
+        return np.asarray(self.embedding_model.encode(texts, batch_size=self.batch_size), dtype=np.float32)
+
+    def encoded_batches(self, batches):
+        if not self.workers:
+            for batch in batches:
+                yield batch, self.encode([combine_game_fields(g) for g in batch])
+            return
+        # Keep a couple of batches per worker in flight while reading the cursor
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.model_name,)) as executor:
+            pending = deque()
+            for batch in batches:
+                texts = [combine_game_fields(g) for g in batch]
+                pending.append((batch, executor.submit(_encode_in_worker, texts, self.batch_size)))
+                if len(pending) >= self.workers * 2:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+            while pending:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+
+    def stored_vector(self, embedding):
+        # binData float32 is 4 bytes per dimension against ~12 for a BSON array of doubles
+        if self.vector_format == "float32":
+            from bson.binary import Binary, BinaryVectorDtype
+            return Binary.from_vector(embedding.tolist(), BinaryVectorDtype.FLOAT32)
+        return embedding.tolist()
+
+    def write(self, updates):
+        from pymongo.errors import BulkWriteError
+
+        try:
+            result = self.target.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            print(f"Bulk write errors: {e.details.get('writeErrors', [])[:3]}")
+            result = None
+        if result is not None:
+            self.stats["upserted"] += result.upserted_count
+            self.stats["modified"] += result.modified_count
+
+    def run(self, force=False):
+        from pymongo import UpdateOne
+
+        self.adopt_keyless()
+        # Partial, so documents without the key can never collide as null
+        self.target.create_index(self.key, unique=True, partialFilterExpression={self.key: {"$exists": True}})
+        updates = []
+        for batch, embeddings in self.encoded_batches(self.batches(self.changed_games(force))):
+            for game, embedding in zip(batch, embeddings):
+                game[self.path] = self.stored_vector(embedding)
+                game.update(normalize_game_fields(game))
+                game["embedded_at"] = time.time()
+                updates.append(UpdateOne({self.key: game[self.key]}, {"$set": game}, upsert=True))
+            self.stats["embedded"] += len(batch)
+            if len(updates) >= self.write_batch_size:
+                self.write(updates)
+                updates = []
+                print(f"Ingestion progress: {self.stats}")
+        if updates:
+            self.write(updates)
+        return self.stats
+
+
+def flatten_chunks(source, target, path="embedding_chunks", game_key="game_id", batch_size=200):
+    # Atlas cannot index an array of vectors, so Steam_Chunked's per-game
+    # embedding_chunks become one document per chunk with the game fields
+    # and filter fields copied on, ready for MongoChunkedVectorSearch.
+    from pymongo import DeleteMany, UpdateOne
+
+    target.create_index([(game_key, 1), ("chunk", 1)], unique=True)
+    projection = {path: 1, **{field: 1 for field in GAME_FIELDS}}
+    updates = []
+    written = 0
+    for game in source.find({path: {"$exists": True}}, projection, batch_size=batch_size):
+        chunks = [chunk for chunk in game.pop(path) or [] if len(chunk)]
+        game_id = game.pop("_id")
+        fields = {**game, **normalize_game_fields(game)}
+        for i, chunk in enumerate(chunks):
+            document = {**fields, game_key: game_id, "chunk": i, "embedding": to_vector(chunk).tolist()}
+            updates.append(UpdateOne({game_key: game_id, "chunk": i}, {"$set": document}, upsert=True))
+        # Drop chunks left over from a longer previous version of the game
+        updates.append(DeleteMany({game_key: game_id, "chunk": {"$gte": len(chunks)}}))
+        if len(updates) >= 1000:
+            written += target.bulk_write(updates, ordered=False).upserted_count
+            updates = []
+    if updates:
+        written += target.bulk_write(updates, ordered=False).upserted_count
+    return written
+
+
+if __name__ == "__main__":
+    # Re-embed whatever changed since the last run:
+    #   python ingestion.py --source Steam --target Steam_Embedding --workers 2
+    #   python ingestion.py --source-parquet data/steam_games
+    from pipeline import MongoDBConnection
+
+    parser = argparse.ArgumentParser(description="Embed games into the vector search collection")
+    parser.add_argument("--source", default=None, help="Source collection (default: Steam, the raw games "
+                                                        "preprocessing_game.ipynb inserts, or Steam_Chunked "
+                                                        "with --flatten-chunks)")
+    parser.add_argument("--source-parquet", default=None,
+                        help="Read games from a catalog written by preprocessing.py instead of a collection")
+    parser.add_argument("--target", default=None, help="Target collection (default: Steam_Embedding, "
+                                                        "or Steam_Chunks with --flatten-chunks)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per encode call")
+    parser.add_argument("--write-batch-size", type=int, default=500, help="Upserts per bulk_write")
+    parser.add_argument("--workers", type=int, default=0, help="Encoder processes (0 encodes in this process)")
+    parser.add_argument("--vector-format", choices=["array", "float32"], default="array",
+                        help="Store embeddings as arrays of doubles or as binData float32 vectors")
+    parser.add_argument("--flatten-chunks", action="store_true",
+                        help="Copy Steam_Chunked's embedding_chunks into one document per chunk")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-embed everything regardless of content hash (e.g. to switch --vector-format)")
+    args = parser.parse_args()
+
+    mongo_conn = MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))
+    started = time.perf_counter()
+    if args.flatten_chunks:
+        source = mongo_conn.db[args.source or "Steam_Chunked"]
+        chunks = flatten_chunks(source, mongo_conn.db[args.target or "Steam_Chunks"])
+        print(f"Flattened chunks in {time.perf_counter() - started:.1f}s, {chunks} new chunk documents")
+    else:
+        target = mongo_conn.db[args.target or "Steam_Embedding"]
+        source = mongo_conn.db[args.source or "Steam"]
+        if args.source_parquet:
+            from preprocessing import ParquetCatalog
+            source = ParquetCatalog(args.source_parquet)
+        embedding_model = None
+        if not args.workers:
+            from sentence_transformers import SentenceTransformer
+            embedding_model = SentenceTransformer(args.model)
+
+        ingestor = EmbeddingIngestor(source, target, embedding_model, model_name=args.model,
+                                     batch_size=args.batch_size, write_batch_size=args.write_batch_size,
+                                     workers=args.workers, vector_format=args.vector_format)
+        stats = ingestor.run(force=args.force)
+        print(f"Ingestion finished in {time.perf_counter() - started:.1f}s: {stats}")
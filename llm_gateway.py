@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from tracing import tracer
+
+
+RETRY_CODES = {429, 500, 503}
+
+
+class LLMUnavailable(Exception):
+    # Raised instead of calling Gemini when the circuit is open, no slot frees
+    # up or the deadline passes; callers answer without the LLM
+    pass
+
+
+def error_code(error):
+    # google.genai APIError carries the HTTP status as .code
+    return getattr(error, "code", None) or getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    return error_code(error) in RETRY_CODES or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def is_rejection(error):
+    # google.genai ClientError other than 429 (bad request, bad key, blocked
+    # prompt): Gemini answered and refused this request, which is no outage.
+    # Everything else, connection errors and resets included, is retried.
+    code = error_code(error)
+    return isinstance(code, int) and 400 <= code < 500 and code != 429
+
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failed calls and rejects calls for
+    # `cooldown` seconds; then a single trial call decides whether it closes
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class LLMGateway:
+    # Shared front for every Gemini call. Exposes .models like genai.Client, so
+    # ModelResponse, Reflection and QueryPlanner take it in place of the client.
+    # - at most max_concurrency calls or open streams in flight; callers wait
+    #   for a slot until their deadline
+    # - identical in-flight generate_content calls are coalesced into one
+    # - 429/5xx and transport errors are retried with full-jitter exponential
+    #   backoff; other 4xx are the request's own fault and raised as is
+    # - every call has a deadline of `timeout` seconds (time to first chunk for streams)
+    # - repeated failures open a circuit breaker that fails fast with LLMUnavailable
+    def __init__(self, client, max_concurrency=8, timeout=20.0, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 breaker_threshold=5, breaker_cooldown=30.0):
+        self.client = client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.inflight = {}
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "errors": 0, "timeouts": 0,
+                      "rejected": 0}
+        self._lock = threading.Lock()
+        self.models = GatewayModels(self)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, breaker=self.breaker.state, inflight=len(self.inflight))
+
+    def _backoff(self, attempt, deadline):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _submit(self, fn, deadline, hold=False):
+        # One attempt on the pool while holding a slot; a timed-out attempt
+        # keeps its slot until the underlying call actually returns. With
+        # hold=True a successful attempt keeps the slot for the caller to release.
+        if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self._count("rejected")
+            raise LLMUnavailable("No free LLM slot before the deadline")
+        future = self.executor.submit(fn)
+        try:
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            self._count("timeouts")
+            future.add_done_callback(lambda _: self.slots.release())
+            raise LLMUnavailable(f"LLM call exceeded its {self.timeout}s deadline") from None
+        except BaseException:
+            self.slots.release()
+            raise
+        if not hold:
+            self.slots.release()
+        return result
+
+    def call(self, fn, hold=False):
+        # Runs fn() under the concurrency cap, retry policy, deadline and breaker
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailable("LLM circuit breaker is open")
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                result = self._submit(fn, deadline, hold)
+            except Exception as e:
+                if is_rejection(e):
+                    # Gemini answered and rejected the request itself: not an outage
+                    self.breaker.success()
+                    raise
+                # 429/5xx, transport errors, or no slot/deadline (LLMUnavailable, not retried)
+                if not isinstance(e, LLMUnavailable):
+                    self._count("rate_limited" if is_retryable(e) else "errors")
+                    if attempt < self.max_retries and self._backoff(attempt, deadline):
+                        attempt += 1
+                        self._count("retries")
+                        continue
+                self.breaker.failure()
+                raise LLMUnavailable(str(e) or type(e).__name__) from e
+            self.breaker.success()
+            return result
+
+    def coalesced(self, key, fn):
+        # Single flight: the first caller for a key makes the call, identical
+        # requests arriving while it runs wait for the same result
+        with self._lock:
+            leader = key not in self.inflight
+            if leader:
+                self.inflight[key] = Future()
+            future = self.inflight[key]
+        if not leader:
+            self._count("coalesced")
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise LLMUnavailable("Coalesced LLM call exceeded its deadline") from None
+        try:
+            result = self.call(fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self.inflight[key]
+
+
+class GatewayModels:
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def generate_content(self, model, contents, config=None):
+        gateway = self.gateway
+        key = (model, contents, repr(config))
+        with tracer.span("llm_gateway", coalesced=key in gateway.inflight, breaker=gateway.breaker.state):
+            return gateway.coalesced(key, lambda: gateway.client.models.generate_content(
+                model=model, contents=contents, config=config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        # Streams are not coalesced; the deadline and retries cover opening the
+        # stream up to its first chunk, and the slot is held until it ends
+        gateway = self.gateway
+        done = object()
+
+        def open_stream():
+            stream = iter(gateway.client.models.generate_content_stream(model=model, contents=contents, config=config))
+            return stream, next(stream, done)
+
+        with tracer.span("llm_gateway", stream=True, breaker=gateway.breaker.state):
+            stream, first = gateway.call(open_stream, hold=True)
+        try:
+            if first is not done:
+                yield first
+                yield from stream
+        finally:
+            gateway.slots.release()
@@ -1,17 +1,99 @@
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
-from google.genai import types
-from google import genai
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import numpy as np
+from search_filters import SearchFilter
+from similar_games import parse_similar_request
+from vector_index import MongoVectorSearch
+from context_builder import build_context, estimate_tokens, retrieval_only_answer
+from llm_gateway import LLMUnavailable
+from tracing import tracer, run_in_context
 
 
 
 load_dotenv('api.env')
 
+# Atlas caps numCandidates at 10000
+MAX_NUM_CANDIDATES = 10000
+# Small talk answer while Gemini is unavailable
+CHAT_FALLBACK = "Sorry, I can't chat right now, but tell me what kind of game you're after and I'll look it up."
+
+FUNCTION_DECLARATIONS = [
+    {
+        "name": "vector_search_filtered",
+        "description": "Search games based on description and apply filters like year range, price, review sentiment, developer, or publisher.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "User's game preferences (e.g., football tactical game)"
+                },
+                "year_range": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "description": "Optional release year range (e.g., [2020, 2024])"
+                },
+                "price_limit": {
+                    "type": "number",
+                    "description": "Maximum price (e.g., 10 for under $10)"
+                },
+                "review_sentiment": {
+                    "type": "string",
+                    "enum": ["Positive", "Mixed", "Negative"],
+                    "description": "Preferred review sentiment"
+                },
+                "developer": {
+                    "type": "string",
+                    "description": "Specific developer or studio name (e.g., 'Ubisoft')"
+                },
+                "publisher": {
+                    "type": "string",
+                    "description": "Specific publisher name (e.g., 'SEGA')"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "chit_chat",
+        "description": "Chit chat message of users",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "User input message that is common chit-chat"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "end_chat",
+        "description": "End chat session",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "End the chat session and further information if needed"
+                }
+            },
+            "required": ["query"]
+        }
+    }
+
+]
+
 
 class MongoDBConnection:
     def __init__(self, mongo_access):
+        from pymongo.mongo_client import MongoClient
+        from pymongo.server_api import ServerApi
+
         self.mongo_access = mongo_access
         # Create a new client and connect to the server
         self.client = MongoClient(mongo_access, server_api=ServerApi('1'))
@@ -27,21 +109,109 @@ class MongoDBConnection:
 
 
 class EmbeddingModelSentence:
-    def __init__(self, embedding_model):
+    def __init__(self, embedding_model, cache_size=4096, batch_size=64):
         self.embedding_model = embedding_model
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_text(text):
+        # all-MiniLM-L6-v2 lowercases and splits on whitespace itself, so this
+        # key maps trivially different queries to the same embedding.
+        return " ".join(text.lower().split())
+
+    def _cache_get(self, key):
+        with self._lock:
+            embedding = self.cache.get(key)
+            if embedding is None:
+                self.cache_misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return embedding
+
+    def _cache_put(self, key, embedding):
+        embedding.setflags(write=False)
+        with self._lock:
+            self.cache[key] = embedding
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def cache_info(self):
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+                "size": len(self.cache),
+                "max_size": self.cache_size,
+            }
 
     def get_embedding(self, text):
         if not isinstance(text, str) or not text.strip():
             print("Skipping invalid text")
-            return []
-        return self.embedding_model.encode(text).tolist()
+            return None
+        key = self.normalize_text(text)
+        with tracer.span("embedding", text_chars=len(key)) as span:
+            embedding = self._cache_get(key)
+            span.set(cache_hit=embedding is not None)
+            if embedding is None:
+                # np.array copies: a view would pin the encoder's whole output array in the cache
+                embedding = np.array(self.embedding_model.encode(key), dtype=np.float32)
+                self._cache_put(key, embedding)
+        return embedding
+
+    def warmup(self, texts=("warm up the encoder",)):
+        # The first forward pass pays for lazy kernel and graph initialisation;
+        # run it at startup, outside the cache, instead of on the first query
+        started = time.perf_counter()
+        self.embedding_model.encode(list(texts), batch_size=self.batch_size)
+        return (time.perf_counter() - started) * 1000
+
+    def get_embeddings(self, texts):
+        # One forward pass for every text that is not cached yet; invalid texts get zero rows
+        keys = [self.normalize_text(t) if isinstance(t, str) and t.strip() else None for t in texts]
+        found = {}
+        missing = {}
+        for key in keys:
+            if key is None or key in found or key in missing:
+                continue
+            embedding = self._cache_get(key)
+            if embedding is None:
+                missing[key] = None
+            else:
+                found[key] = embedding
+
+        if missing:
+            encoded = np.asarray(self.embedding_model.encode(list(missing), batch_size=self.batch_size), dtype=np.float32)
+            for key, embedding in zip(missing, encoded):
+                embedding = embedding.copy()
+                self._cache_put(key, embedding)
+                found[key] = embedding
+
+        dim = next(iter(found.values())).shape[0] if found else self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key is None:
+                print("Skipping invalid text")
+            else:
+                embeddings[i] = found[key]
+        return embeddings
 
 
 class DataHandler:
-    def __init__(self, user_query, collection, embedding_model):
+    def __init__(self, user_query, collection, embedding_model, vector_index=None, similar_index=None):
         self.user_query = user_query
         self.collection = collection
         self.embedding_model = embedding_model
+        self.vector_index = vector_index
+        self.similar_index = similar_index
 
 
     def smart_vector_search(self,
@@ -52,91 +222,177 @@ class DataHandler:
             review_sentiment: str = None,
             developer: str = None,
             publisher: str = None,
-            limit: int = 100
+            top_k: int = 3,
+            num_candidates: int = 100
     ):
         # Step 1: Embed the query
         query_embedding = self.embedding_model.get_embedding(query)
-        if not query_embedding:
+        if query_embedding is None:
             return []
 
-        # Step 2: Run vector search in MongoDB
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "default",
-                    "queryVector": query_embedding,
-                    "path": "embedding",
-                    "numCandidates": 400,
-                    "limit": limit,
-                }
-            },
-            {"$unset": "embedding"},
-            {
-                "$project": {
-                    "_id": 0,
-                    "name": 1,
-                    "description": 1,
-                    "all_reviews": 1,
-                    "release_date": 1,
-                    "developer": 1,
-                    "publisher": 1,
-                    "price": 1,
-                    "score": {"$meta": "vectorSearchScore"},
-                }
-            }
-        ]
-
-        results = list(collection.aggregate(pipeline))
-
-        # Step 3: Post-filter
-        filtered_results = []
-        for game in results:
-            # Release year filtering
-            if year_range and isinstance(game.get("release_date"), datetime):
-                year = game["release_date"].year
-                if not (year_range[0] <= year <= year_range[1]):
-                    continue
-
-            # Price filtering
-            if price_limit is not None:
-                price_str = str(game.get("price", "")).replace("$", "").strip()
-                try:
-                    game_price = float(price_str)
-                    if game_price > price_limit:
-                        continue
-                except ValueError:
-                    continue
-
-            # Review sentiment filtering
-            if review_sentiment and review_sentiment.lower() not in game.get("all_reviews", "").lower():
-                continue
+        # Step 2: Run the filtered vector search on the local index, or in MongoDB
+        backend = self.vector_index if self.vector_index is not None else MongoVectorSearch(collection)
+        search_filter = SearchFilter(year_range, price_limit, review_sentiment, developer, publisher)
+        with tracer.span("vector_search", backend=type(backend).__name__, filtered=not search_filter.is_empty()) as span:
+            results = backend.search(query_embedding, limit=top_k, num_candidates=num_candidates, search_filter=search_filter)
 
-            # Developer match
-            if developer and developer.lower() not in game.get("developer", "").lower():
-                continue
-
-            # Publisher match
-            if publisher and publisher.lower() not in game.get("publisher", "").lower():
-                continue
+            # Step 3: Widen the candidate pool while a selective filter leaves too few hits
+            widenings = 0
+            while len(results) < top_k and not backend.exact and num_candidates < MAX_NUM_CANDIDATES:
+                num_candidates = min(num_candidates * 4, MAX_NUM_CANDIDATES)
+                widenings += 1
+                results = backend.search(query_embedding, limit=top_k, num_candidates=num_candidates, search_filter=search_filter)
+            span.set(num_candidates=num_candidates, widenings=widenings, results=len(results))
 
-            filtered_results.append(game)
+        return results[:top_k]
 
-        return filtered_results[:3] if filtered_results else results[:3]
+    def similar_games(self,
+            game,
+            year_range: list[int] = None,
+            price_limit: float = None,
+            review_sentiment: str = None,
+            developer: str = None,
+            publisher: str = None,
+            top_k: int = 3
+    ):
+        # "More like <game>" from the precomputed neighbour graph (similar_games.py):
+        # no query embedding and no database round trip
+        if self.similar_index is None:
+            return []
+        search_filter = SearchFilter(year_range, price_limit, review_sentiment, developer, publisher)
+        with tracer.span("similar_games", filtered=not search_filter.is_empty()) as span:
+            results = self.similar_index.similar(game, limit=top_k, search_filter=search_filter)
+            span.set(results=len(results))
+        return results
+
+    def prefetch_candidates(self, query, collection, cancelled=None, limit=100, num_candidates=400):
+        # Unfiltered search that can run before the router has picked the filters
+        query_embedding = self.embedding_model.get_embedding(query)
+        if query_embedding is None or (cancelled is not None and cancelled.is_set()):
+            return []
+        backend = self.vector_index if self.vector_index is not None else MongoVectorSearch(collection)
+        with tracer.span("prefetch_search", backend=type(backend).__name__, num_candidates=num_candidates) as span:
+            results = backend.search(query_embedding, limit=limit, num_candidates=num_candidates)
+            span.set(results=len(results))
+        return results
+
+    def filter_candidates(self,
+            candidates,
+            year_range: list[int] = None,
+            price_limit: float = None,
+            review_sentiment: str = None,
+            developer: str = None,
+            publisher: str = None,
+            top_k: int = 3
+    ):
+        search_filter = SearchFilter(year_range, price_limit, review_sentiment, developer, publisher)
+        with tracer.span("post_filter", candidates=len(candidates)) as span:
+            results = [game for game in candidates if search_filter.matches(game)][:top_k]
+            span.set(results=len(results))
+        return results
 
 
 
 class ModelResponse:
-    def __init__(self, gemini_api_key):
-        self.client = genai.Client(api_key=gemini_api_key)
-
-    def generate_response(self, user_query, retrieved_games):
+    def __init__(self, gemini_api_key, speculative=False, max_workers=4, response_cache=None, client=None,
+                 title_index=None, context_token_budget=None, similar_index=None):
+        if client is None:
+            # google.genai takes most of a second to import, so only load it when it is used
+            from google import genai
+            client = genai.Client(api_key=gemini_api_key)
+        self.client = client
+        self.response_cache = response_cache
+        # Queries that are just a game title resolve through the title index
+        self.title_index = title_index
+        # "More like this" follow-ups resolve through the precomputed neighbour graph
+        self.similar_index = similar_index
+        # Token budget for the retrieved-games block of the prompt (None = unbounded)
+        self.context_token_budget = context_token_budget
+        # Speculative mode embeds and searches while the routing call is in flight
+        self.speculative = speculative
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if speculative else None
+
+    def start_prefetch(self, query, collection, embedding_model, vector_index=None):
+        # Speculative unfiltered retrieval for query, started before the router
+        # or the planner has picked the tool and filters
+        if not self.speculative:
+            return None
+        data_handler = DataHandler(query, collection, embedding_model, vector_index)
+        cancelled = threading.Event()
+        future = run_in_context(self.executor, data_handler.prefetch_candidates, query, collection, cancelled)
+        return {"query": query, "future": future, "cancelled": cancelled}
+
+    @staticmethod
+    def drop_prefetch(prefetch):
+        if prefetch is not None:
+            prefetch["cancelled"].set()
+            prefetch["future"].cancel()
+
+    def _collect_prefetch(self, prefetch):
+        try:
+            return prefetch["future"].result()
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            return None
+
+    def _generate(self, contents, stream=False, fallback=None):
+        # fallback is answered instead when the LLM gateway reports Gemini unavailable
+        if not stream:
+            try:
+                with tracer.span("generation", prompt_chars=len(contents)) as span:
+                    response = self.client.models.generate_content(
+                        model="gemini-2.0-flash",
+                        contents=contents
+                    )
+                    span.set(response_chars=len(response.text or ""))
+            except LLMUnavailable as e:
+                if fallback is None:
+                    raise
+                print(f"⚠️ Gemini unavailable, using the fallback answer: {e}")
+                return fallback
+            return response.text
+        return self._stream_chunks(contents, fallback=fallback)
+
+    def _stream_chunks(self, contents, on_complete=None, fallback=None):
+        chunks = []
+        try:
+            with tracer.span("generation", prompt_chars=len(contents), stream=True) as span:
+                started = time.perf_counter()
+                for chunk in self.client.models.generate_content_stream(
+                    model="gemini-2.0-flash",
+                    contents=contents
+                ):
+                    if chunk.text:
+                        if not chunks:
+                            span.set(first_chunk_ms=(time.perf_counter() - started) * 1000)
+                        chunks.append(chunk.text)
+                        yield chunk.text
+                span.set(response_chars=sum(len(c) for c in chunks))
+        except LLMUnavailable as e:
+            # The gateway only gives up before the first chunk, so nothing was streamed yet
+            if fallback is None or chunks:
+                raise
+            print(f"⚠️ Gemini unavailable, using the fallback answer: {e}")
+            yield fallback
+            return
+        if on_complete is not None:
+            on_complete("".join(chunks))
+
+    def generate_response(self, user_query, retrieved_games, query_embedding=None, filter_args=None, stream=False):
         if not retrieved_games or isinstance(retrieved_games, str):
             return "Sorry, I couldn't find any games matching your query."
 
-        context = "\n".join([
-            f"{g['name']}: {g['description']}: {g['all_reviews']}: {g['release_date']}: {g['publisher']}: {g['price']}"
-            for g in retrieved_games if isinstance(g, dict)
-        ])
+        game_names = [g.get("name") or "" for g in retrieved_games if isinstance(g, dict)]
+        if self.response_cache is not None:
+            with tracer.span("response_cache") as span:
+                cached = self.response_cache.lookup(query_embedding, filter_args, game_names)
+                span.set(hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        with tracer.span("context", budget=self.context_token_budget) as span:
+            context = build_context(retrieved_games, self.context_token_budget)
+            span.set(context_tokens=estimate_tokens(context))
 
         prompt = f"""
         You are a game recommendation agent. Your task is to provide engaging and convincing recommendations to users based on their queries and the following retrieved game information.
@@ -154,121 +410,156 @@ class ModelResponse:
         - Make the user want to play the game.
         """
 
-        response = self.client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
-
-        return response.text
-
-    def process_response(self, user_query, collection, embedding_model):
-
-        function_declarations = [
-            {
-                "name": "vector_search_filtered",
-                "description": "Search games based on description and apply filters like year range, price, review sentiment, developer, or publisher.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "User's game preferences (e.g., football tactical game)"
-                        },
-                        "year_range": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "Optional release year range (e.g., [2020, 2024])"
-                        },
-                        "price_limit": {
-                            "type": "number",
-                            "description": "Maximum price (e.g., 10 for under $10)"
-                        },
-                        "review_sentiment": {
-                            "type": "string",
-                            "enum": ["Positive", "Mixed", "Negative"],
-                            "description": "Preferred review sentiment"
-                        },
-                        "developer": {
-                            "type": "string",
-                            "description": "Specific developer or studio name (e.g., 'Ubisoft')"
-                        },
-                        "publisher": {
-                            "type": "string",
-                            "description": "Specific publisher name (e.g., 'SEGA')"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "chit_chat",
-                "description": "Chit chat message of users",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "User input message that is common chit-chat"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "end_chat",
-                "description": "End chat session",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "End the chat session and further information if needed"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            }
+        def cache_response(text):
+            if self.response_cache is not None:
+                self.response_cache.add(query_embedding, filter_args, game_names, text)
 
-        ]
-        tools = types.Tool(function_declarations=function_declarations)
+        # Fallback answers are not cached, only real generations are
+        fallback = retrieval_only_answer(retrieved_games)
+        if stream:
+            return self._stream_chunks(prompt, on_complete=cache_response, fallback=fallback)
+        try:
+            response_text = self._generate(prompt)
+        except LLMUnavailable as e:
+            print(f"⚠️ Gemini unavailable, answering from retrieval only: {e}")
+            return fallback
+        cache_response(response_text)
+        return response_text
+
+    def match_title(self, user_query):
+        if self.title_index is None:
+            return []
+        with tracer.span("title_match") as span:
+            games = self.title_index.lookup(user_query)
+            span.set(matches=len(games))
+        return games
+
+    def match_similar(self, user_query, chat_history=None):
+        # "Something like the second one": neighbours of a game from the previous
+        # answer (or a named one), filtered like the previous search
+        if self.similar_index is None:
+            return []
+        game = parse_similar_request(user_query, getattr(chat_history, "last_games", None))
+        if game is None:
+            return []
+        filters = getattr(chat_history, "filters", None) or {}
+        data_handler = DataHandler(user_query, None, None, similar_index=self.similar_index)
+        return data_handler.similar_games(game, **filters)
+
+    def process_response(self, user_query, collection, embedding_model, vector_index=None, plan=None,
+                         title_matches=None, on_retrieval=None):
+        with tracer.span("process_response", planned=plan is not None):
+            return self._respond(user_query, collection, embedding_model, vector_index, stream=False, plan=plan,
+                                 title_matches=title_matches, on_retrieval=on_retrieval)
+
+    def stream_response(self, user_query, collection, embedding_model, vector_index=None, plan=None,
+                        title_matches=None, on_retrieval=None):
+        # Routing and retrieval run eagerly; the returned iterator yields answer chunks
+        with tracer.span("process_response", planned=plan is not None, stream=True):
+            result = self._respond(user_query, collection, embedding_model, vector_index, stream=True, plan=plan,
+                                   title_matches=title_matches, on_retrieval=on_retrieval)
+        if result is None:
+            return iter(())
+        if isinstance(result, str):
+            return iter([result])
+        return result
+
+    def _route(self, user_query):
+        from google.genai import types
+
+        tools = types.Tool(function_declarations=FUNCTION_DECLARATIONS)
         config = types.GenerateContentConfig(tools=[tools])
 
-        response = self.client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=user_query,
-            config=config,
-        )
-        candidate = response.candidates[0]
-
-        if candidate.content.parts and candidate.content.parts[0].function_call:
-            function_call = candidate.content.parts[0].function_call
-            print(f"🔧 Function to call: {function_call.name}")
-            print(f"📥 Arguments: {function_call.args}")
-
-            if function_call.name == "vector_search_filtered":
-                args = function_call.args
-                data_handler= DataHandler(user_query, collection, embedding_model)
-                results = data_handler.smart_vector_search(
-                    query=user_query,
-                    collection=collection,
-                    year_range=args.get("year_range"),
-                    price_limit=args.get("price_limit"),
-                    review_sentiment=args.get("review_sentiment"),
-                    developer=args.get("developer"),
-                    publisher=args.get("publisher")
-                )
-            elif function_call.name == "chit-chat":
-                chit_chat_response = self.client.models.generate_content(
+        with tracer.span("routing", prompt_chars=len(user_query)) as span:
+            try:
+                response = self.client.models.generate_content(
                     model="gemini-2.0-flash",
-                    contents=function_call.args["query"],
+                    contents=user_query,
+                    config=config,
                 )
-                return chit_chat_response.text
-            else:
-                end_response = self.client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=function_call.args["query"],
-                )
-                return end_response.text
-
-            # Use local model to generate the response
-            return ModelResponse.generate_response(self,user_query, results)
\ No newline at end of file
+            except LLMUnavailable as e:
+                # Without the router every message is treated as an unfiltered game search
+                print(f"⚠️ Gemini unavailable, routing to search: {e}")
+                span.set(tool="vector_search_filtered", fallback=True)
+                return "vector_search_filtered", {"query": user_query}
+            candidate = response.candidates[0]
+
+            if candidate.content.parts and candidate.content.parts[0].function_call:
+                function_call = candidate.content.parts[0].function_call
+                span.set(tool=function_call.name)
+                return function_call.name, function_call.args
+            return None, None
+
+    def _respond(self, user_query, collection, embedding_model, vector_index, stream, plan=None, title_matches=None,
+                 on_retrieval=None):
+        # on_retrieval(games, filters) sees the games the answer is generated from
+        if title_matches is None and plan is None:
+            title_matches = self.match_title(user_query)
+        if title_matches:
+            # A bare title or a "more like this" follow-up needs neither routing nor an embedding
+            print(f"🎯 Direct match: {[g.get('name') for g in title_matches]}")
+            if on_retrieval is not None:
+                on_retrieval(title_matches, None)
+            return self.generate_response(user_query, title_matches, stream=stream)
+
+        data_handler = DataHandler(user_query, collection, embedding_model, vector_index)
+        # Started by plan_turn alongside the planner call, for the raw prompt
+        prefetch = plan.get("prefetch") if plan is not None else None
+        if prefetch is not None and EmbeddingModelSentence.normalize_text(prefetch["query"]) \
+                != EmbeddingModelSentence.normalize_text(user_query):
+            # The planner rewrote the message with the chat history, so the raw prompt's candidates do not apply
+            self.drop_prefetch(prefetch)
+            prefetch = None
+
+        if plan is not None and plan.get("tool"):
+            # The query planner already chose the tool and its arguments
+            tool, args = plan["tool"], plan.get("args", {})
+        else:
+            if prefetch is None:
+                prefetch = self.start_prefetch(user_query, collection, embedding_model, vector_index)
+            try:
+                tool, args = self._route(user_query)
+            except Exception:
+                self.drop_prefetch(prefetch)
+                raise
+
+        if tool != "vector_search_filtered":
+            # No retrieval needed, drop the prefetch
+            self.drop_prefetch(prefetch)
+
+        if tool is None:
+            return None
+
+        print(f"🔧 Function to call: {tool}")
+        print(f"📥 Arguments: {args}")
+
+        if tool != "vector_search_filtered":
+            # chit_chat and end_chat answer the router's query directly
+            return self._generate(args.get("query") or user_query, stream, fallback=CHAT_FALLBACK)
+
+        filters = {
+            "year_range": args.get("year_range"),
+            "price_limit": args.get("price_limit"),
+            "review_sentiment": args.get("review_sentiment"),
+            "developer": args.get("developer"),
+            "publisher": args.get("publisher"),
+        }
+        results = None
+        if prefetch is not None:
+            candidates = self._collect_prefetch(prefetch)
+            if candidates is not None:
+                results = data_handler.filter_candidates(candidates, **filters)
+        # Fall back to the filtered search when the prefetched pool is too thin
+        if results is None or len(results) < 3:
+            results = data_handler.smart_vector_search(
+                query=user_query,
+                collection=collection,
+                **filters
+            )
+
+        if on_retrieval is not None:
+            on_retrieval(results, filters)
+
+        # Use local model to generate the response
+        query_embedding = embedding_model.get_embedding(user_query) if self.response_cache is not None else None
+        return ModelResponse.generate_response(self,user_query, results, query_embedding, filters, stream)
@@ -0,0 +1,84 @@
+import json
+
+from llm_gateway import LLMUnavailable
+from pipeline import FUNCTION_DECLARATIONS
+from reflection import Reflection
+from tracing import tracer
+
+
+TOOLS = [declaration["name"] for declaration in FUNCTION_DECLARATIONS]
+FILTER_PROPERTIES = {
+    name: schema for name, schema in FUNCTION_DECLARATIONS[0]["parameters"]["properties"].items() if name != "query"
+}
+
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "standalone_query": {
+            "type": "string",
+            "description": "The latest user message rewritten as a standalone game query"
+        },
+        "tool": {
+            "type": "string",
+            "enum": TOOLS,
+            "description": "vector_search_filtered for game requests, chit_chat for small talk, end_chat to end the session"
+        },
+        **FILTER_PROPERTIES,
+    },
+    "required": ["standalone_query", "tool"]
+}
+
+
+class QueryPlanner:
+    # Does the work of Reflection.get_standalone_query and the function-calling
+    # router in one structured call.
+    def __init__(self, llm):
+        self.llm = llm
+
+    def plan(self, chat_history, new_prompt):
+        history_string = Reflection(self.llm).concat_and_format_texts(chat_history) if chat_history else ""
+        prompt = f"""
+        You are the query planner of a Steam game recommendation chatbot.
+
+        1. If the latest user message depends on the chat history, rewrite it into a standalone game query. Otherwise keep it unchanged.
+        2. Choose the tool: vector_search_filtered for game requests, chit_chat for common chit-chat, end_chat when the user wants to end the session.
+        3. For vector_search_filtered, fill in only the filters the user actually asked for (release year range, maximum price, review sentiment, developer, publisher).
+
+        Chat History:
+        {history_string}
+        New prompt:
+        {new_prompt}
+        """
+
+        from google.genai import types
+
+        with tracer.span("planner", prompt_chars=len(prompt), history_turns=len(chat_history or [])) as span:
+            try:
+                response = self.llm.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        response_schema=PLAN_SCHEMA,
+                    ),
+                )
+            except LLMUnavailable as e:
+                # Retrieval-only turn: search with the raw message, no filters
+                print(f"⚠️ Gemini unavailable, searching without a plan: {e}")
+                span.set(tool="vector_search_filtered", fallback=True)
+                return {"query": new_prompt, "tool": "vector_search_filtered", "args": {"query": new_prompt}}
+
+            try:
+                planned = json.loads(response.text)
+            except (TypeError, ValueError):
+                print(f"Could not parse plan: {response.text}")
+                span.set(tool=None, parse_error=True)
+                return {"query": new_prompt, "tool": None, "args": {}}
+
+            query = (planned.get("standalone_query") or new_prompt).strip()
+            tool = planned.get("tool") if planned.get("tool") in TOOLS else None
+            args = {"query": query}
+            args.update({name: planned[name] for name in FILTER_PROPERTIES if planned.get(name) is not None})
+            span.set(tool=tool, query=query, rewritten=query != new_prompt.strip(),
+                     filters={name: value for name, value in args.items() if name != "query"})
+        return {"query": query, "tool": tool, "args": args}
@@ -0,0 +1,201 @@
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+
+from search_filters import REVIEW_LABELS
+
+
+RAW_PATHS = [os.path.join("data", "steam_game_descriptions_part_1.csv"),
+             os.path.join("data", "steam_game_descriptions_part_2.csv")]
+# Rate the notebook used to turn Vietnamese store prices into dollars
+VND_PER_USD = 25000
+# Too few reviews to recommend from; these games are dropped
+DROPPED_REVIEWS = ["No reviews", "Few user reviews"]
+CATEGORY_COLUMNS = ["all_reviews", "developer", "publisher", "review_label", "developer_lc", "publisher_lc"]
+PARTITION_COLUMN = "release_year"
+
+# clean_text's emoji, URL and punctuation passes in one: emoji are symbols and
+# fall under [^\w\s'] except keycaps and ℹ, which hold a word character and
+# are matched whole first, as emoji.replace_emoji removed them
+TEXT_NOISE = re.compile(r"http\S+|[0-9]\ufe0f?\u20e3|\u2139|[^\w\s']+")
+
+
+def load_stop_words():
+    # NLTK's English list, as the notebook used
+    import nltk
+    from nltk.corpus import stopwords
+
+    try:
+        return set(stopwords.words("english"))
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+        return set(stopwords.words("english"))
+
+
+def by_value(series, transform):
+    # Runs a column transform over the distinct values only and broadcasts the
+    # result back by code: prices, review summaries and studios repeat across
+    # thousands of games
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    result = transform(pd.Series(uniques, dtype=object)).iloc[codes]
+    result.index = series.index
+    return result
+
+
+def convert_prices(prices):
+    # converting_price from the notebook plus the dollar value as a float:
+    # free/demo -> $0, ₫ amounts -> dollars, $ prices kept, anything else None
+    def convert(values):
+        text = values.map(str).str.lower()
+        free = text.str.contains("free", regex=False) | text.str.contains("demo", regex=False)
+        vnd = ~free & text.str.contains("₫", regex=False)
+        usd = ~free & ~vnd & text.str.contains("$", regex=False)
+        # The notebook sliced the first digit off ₫ amounts (price[1:]); all digits count here
+        vnd_value = pd.to_numeric(text.where(vnd).str.replace(r"\D", "", regex=True), errors="coerce")
+        vnd_value = (vnd_value / VND_PER_USD).round(2)
+        usd_value = pd.to_numeric(text.where(usd).str.replace(r"[$,]", "", regex=True).str.strip(), errors="coerce")
+
+        value = vnd_value.mask(usd, usd_value).mask(free, 0.0)
+        price = pd.Series(None, index=values.index, dtype=object)
+        price = price.mask(usd, text).mask(vnd & value.notna(), "$" + value.map("{:.2f}".format)).mask(free, "$0")
+        return pd.DataFrame({"price": price, "price_value": value.astype("float64")})
+
+    return by_value(prices, convert)
+
+
+def label_reviews(all_reviews):
+    # review_labeling from the notebook: "7 user reviews" means too few for a summary
+    def label(values):
+        reviews = values.fillna("No reviews")
+        return reviews.mask(reviews.map(str).str.contains("user reviews", regex=False), "Few user reviews")
+
+    return by_value(all_reviews, label)
+
+
+def review_labels(all_reviews):
+    # search_filters.review_label per game: the first of REVIEW_LABELS the summary mentions
+    def label(values):
+        text = values.map(str).str.lower()
+        labels = pd.Series(None, index=values.index, dtype=object)
+        for name in reversed(REVIEW_LABELS):
+            labels = labels.mask(text.str.contains(name.lower(), regex=False), name)
+        return labels
+
+    return by_value(all_reviews, label)
+
+
+def normalized_text(values):
+    # search_filters.normalize_text per game
+    def normalize(text):
+        text = text.str.strip().str.lower()
+        return text.mask(text == "")
+
+    return by_value(values, normalize)
+
+
+def clean_descriptions(descriptions, stop_words=None):
+    # clean_text from the notebook without the emoji tokenizer: one regex pass,
+    # then splitting on whitespace collapses it and drops the stop words. Object
+    # dtype keeps Python's re and str.lower semantics on Arrow-backed strings.
+    stop_words = load_stop_words() if stop_words is None else stop_words
+    text = descriptions.astype(object)
+    text = text.where(text.map(lambda value: isinstance(value, str)), "")
+    words = text.str.replace(TEXT_NOISE, "", regex=True).str.lower().str.split()
+    return words.map(lambda tokens: " ".join(token for token in tokens if token not in stop_words))
+
+
+def preprocess(game_data, stop_words=None):
+    # The cleaning steps of preprocessing_game.ipynb, in the same order, plus
+    # the typed filter fields (search_filters.FILTER_FIELDS) stored as columns
+    prices = convert_prices(game_data["price"])
+    games = game_data.assign(price=prices["price"], price_value=prices["price_value"])
+    games = games[games["price"].notna()]
+
+    release_date = pd.to_datetime(games["release_date"], errors="coerce")
+    games = games.assign(release_date=release_date, release_year=release_date.dt.year.astype("Int16"),
+                         all_reviews=label_reviews(games["all_reviews"]))
+    games = games[~games["all_reviews"].isin(DROPPED_REVIEWS)].copy()
+
+    games["developer"] = games["developer"].fillna("Unknown")
+    games["publisher"] = games["publisher"].fillna("Unknown")
+    games["all_count"] = pd.to_numeric(games["all_count"], errors="coerce").astype("float64").fillna(0)
+    games["description"] = clean_descriptions(games["description"], stop_words)
+
+    games["review_label"] = review_labels(games["all_reviews"])
+    games["developer_lc"] = normalized_text(games["developer"])
+    games["publisher_lc"] = normalized_text(games["publisher"])
+    for column in CATEGORY_COLUMNS:
+        games[column] = games[column].astype("category")
+    return games.reset_index(drop=True)
+
+
+def load_raw(paths=RAW_PATHS):
+    frames = []
+    for path in paths:
+        if os.path.exists(path):
+            frames.append(pd.read_csv(path))
+        else:
+            print(f"⚠️ File not found: {os.path.abspath(path)}")
+    if not frames:
+        raise FileNotFoundError("No game data loaded")
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_catalog(games, path):
+    # Hive layout, one directory per release year (release_year=2019/...), so
+    # readers filtering on years only open those files
+    games.to_parquet(path, index=False, partition_cols=[PARTITION_COLUMN], existing_data_behavior="delete_matching")
+
+
+def partitioning():
+    # Typed partition keys; inferred ones come back as a dictionary column
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int16())]), flavor="hive")
+
+
+def read_catalog(path, columns=None, year_range=None):
+    # year_range skips whole partitions
+    filters = None
+    if year_range:
+        filters = [(PARTITION_COLUMN, ">=", int(year_range[0])), (PARTITION_COLUMN, "<=", int(year_range[-1]))]
+    return pd.read_parquet(path, columns=columns, filters=filters, partitioning=partitioning())
+
+
+def to_records(games):
+    # Plain Python values for pymongo and the pipeline: missing values become
+    # None, categories strings, dates datetimes
+    return games.astype(object).where(games.notna(), None).to_dict("records")
+
+
+class ParquetCatalog:
+    # Read-only source over a catalog written by write_catalog, with the one
+    # find() call EmbeddingIngestor makes; query and projection are ignored
+    def __init__(self, path):
+        self.path = path
+
+    def find(self, query=None, projection=None, batch_size=1000):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.path, format="parquet", partitioning=partitioning())
+        for batch in dataset.to_batches(batch_size=batch_size):
+            yield from to_records(batch.to_pandas())
+
+
+if __name__ == "__main__":
+    # Clean the crawled CSVs into a Parquet catalog for ingestion.py --source-parquet:
+    #   python preprocessing.py data/steam_game_descriptions_part_*.csv --output data/steam_games
+    parser = argparse.ArgumentParser(description="Clean crawled Steam games into a partitioned Parquet catalog")
+    parser.add_argument("inputs", nargs="*", default=RAW_PATHS, help="Crawler CSV files")
+    parser.add_argument("--output", default=os.path.join("data", "steam_games"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    raw = load_raw(args.inputs)
+    games = preprocess(raw)
+    write_catalog(games, args.output)
+    print(f"Kept {len(games)} of {len(raw)} games in {time.perf_counter() - started:.1f}s, wrote {args.output}")
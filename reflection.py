@@ -1,9 +1,33 @@
 # reflection.py
+import re
+
+from chat_history import ChatHistory
+from llm_gateway import LLMUnavailable
+from tracing import tracer
+
+# Pronouns, ordinals and follow-up phrases that only make sense with prior turns
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|it's|that|this|those|these|them|they|their|one|ones|another|other|others|"
+    r"more|else|similar|same|instead|also|too|first|second|third|last|previous|above|"
+    r"cheaper|newer|older|better|like that|what about|how about)\b"
+    r"|^\s*(and|but|or|then|so)\b",
+    re.IGNORECASE,
+)
+
+
+def needs_context(new_prompt):
+    # Very short messages ("under $10?", "any on sale") are usually follow-ups too
+    return bool(FOLLOW_UP_PATTERN.search(new_prompt)) or len(new_prompt.split()) <= 3
+
+
 class Reflection:
     def __init__(self, llm):
         self.llm = llm
 
     def concat_and_format_texts(self, chat_history):
+        if isinstance(chat_history, ChatHistory):
+            # Bounded window, rolling summary and state instead of the full transcript
+            return chat_history.to_prompt()
         lines = []
         for msg in chat_history:
             role = msg.get("role", "user")
@@ -13,6 +37,11 @@ class Reflection:
 
     # reflection.py
     def get_standalone_query(self, chat_history,new_prompt):
+        # Fast path: nothing to resolve against the history, skip the LLM call
+        if not chat_history or not needs_context(new_prompt):
+            with tracer.span("reflection", fast_path=True):
+                return new_prompt
+
         history_string = self.concat_and_format_texts(chat_history)
         prompt = f"""
         You are a system designed to reformulate user messages into standalone game queries. Be friendly and concise. Your task is to determine if the latest user message depends on prior context.
@@ -26,10 +55,16 @@ class Reflection:
         Return only the rewritten message or the original message. Do not include any explanations, recommendations, or additional text.
         """
 
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
+        with tracer.span("reflection", fast_path=False, prompt_chars=len(prompt), history_turns=len(chat_history)):
+            try:
+                response = self.llm.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=prompt
+                )
+            except LLMUnavailable as e:
+                # Searching with the raw follow-up beats failing the turn
+                print(f"⚠️ Gemini unavailable, keeping the original query: {e}")
+                return new_prompt
         print(prompt)
 
         return response.text.strip()
@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from encoders import MicroBatchEncoder, load_encoder
+from llm_gateway import LLMGateway
+from pipeline import DataHandler, EmbeddingModelSentence, ModelResponse, MongoDBConnection
+from planner import QueryPlanner
+from reflection import Reflection
+from response_cache import SemanticResponseCache, SQLiteResponseStore
+from similar_games import SimilarGames
+from title_index import TitleIndex
+from tracing import tracer, JsonlExporter, start_metrics_server
+from vector_index import ChunkedVectorIndex, LocalVectorIndex, MongoChunkedVectorSearch, QuantizedVectorIndex
+
+
+load_dotenv("api.env")
+
+
+class Resources:
+    # Everything a chat turn needs, loaded once per process and shared by every
+    # session: the Streamlit app caches one instance, server.py serves all
+    # requests from one.
+    def __init__(self, mongo_conn, vector_index, embedding_model, model_response, use_planner=True):
+        self.mongo_conn = mongo_conn
+        self.vector_index = vector_index
+        self.embedding_model = embedding_model
+        self.model_response = model_response
+        # Reflection and the planner reuse the ModelResponse genai client
+        self.reflection = Reflection(model_response.client)
+        self.planner = QueryPlanner(model_response.client)
+        self.use_planner = use_planner
+
+    @property
+    def collection(self):
+        return self.mongo_conn.collection if self.mongo_conn else None
+
+    def plan_turn(self, chat_history, prompt):
+        # Returns (query, plan, title_matches) for stream_turn; title_matches
+        # also carries the games of a "more like this" follow-up
+        plan = None
+        title_matches = self.model_response.match_similar(prompt, chat_history) \
+            or self.model_response.match_title(prompt)
+        if title_matches:
+            query = prompt
+        elif self.use_planner:
+            # Planner mode rewrites the query and routes it in one LLM call; the
+            # raw prompt is searched meanwhile and used when the planner keeps it
+            prefetch = self.model_response.start_prefetch(prompt, self.collection, self.embedding_model,
+                                                          self.vector_index)
+            try:
+                plan = self.planner.plan(chat_history, prompt)
+            except Exception:
+                self.model_response.drop_prefetch(prefetch)
+                raise
+            plan["prefetch"] = prefetch
+            query = plan["query"]
+        elif chat_history:
+            # Use Reflection to rewrite the user query with the chat history
+            query = self.reflection.get_standalone_query(chat_history, prompt)
+            print(query)
+        else:
+            query = prompt
+        return query, plan, title_matches
+
+    def stream_turn(self, query, plan=None, title_matches=None, on_retrieval=None):
+        return self.model_response.stream_response(
+            user_query=query,
+            collection=self.collection,
+            embedding_model=self.embedding_model,
+            vector_index=self.vector_index,
+            plan=plan,
+            title_matches=title_matches,
+            on_retrieval=on_retrieval,
+        )
+
+    def search(self, query, top_k=3, **filters):
+        data_handler = DataHandler(query, self.collection, self.embedding_model, self.vector_index)
+        return data_handler.smart_vector_search(query=query, collection=self.collection, top_k=top_k, **filters)
+
+
+def load_encoder_warm(micro_batch_ms=0, max_batch=64):
+    # torch or ONNX Runtime (encoder_backend=onnx / onnx-int8, exported with encoders.py)
+    encoder = load_encoder(os.environ.get("encoder_backend", "torch"),
+                           onnx_dir=os.environ.get("onnx_encoder_path", "onnx_encoder"))
+    if micro_batch_ms:
+        encoder = MicroBatchEncoder(encoder, max_batch=max_batch, window_ms=micro_batch_ms)
+    embedding_model = EmbeddingModelSentence(encoder)
+    print(f"Encoder warmup took {embedding_model.warmup():.0f} ms")
+    return embedding_model
+
+
+def load_resources(micro_batch_ms=0):
+    # The encoder loads and warms up in the background while the index,
+    # database connection and Gemini client are set up
+    startup = ThreadPoolExecutor(max_workers=1)
+    encoder_future = startup.submit(load_encoder_warm, micro_batch_ms)
+    # Use the local vector index snapshot when configured, no Atlas cluster needed
+    index_path = os.environ.get("local_index_path")
+    quantization = os.environ.get("local_index_quantization")
+    # retrieval_layout=chunked searches several vectors per game and ranks games by their max or sum chunk score
+    chunked = os.environ.get("retrieval_layout", "game") == "chunked"
+    chunk_aggregate = os.environ.get("chunk_aggregate", "max")
+    vector_index = None
+    if index_path and chunked:
+        vector_index = ChunkedVectorIndex.load(index_path, aggregate=chunk_aggregate)
+    elif index_path:
+        vector_index = QuantizedVectorIndex.load(index_path, mode=quantization) if quantization else LocalVectorIndex.load(index_path)
+    local_index = isinstance(vector_index, LocalVectorIndex)
+    mongo_conn = None if local_index else MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))  # from .env
+    if chunked and not local_index:
+        # Atlas cannot index arrays of vectors, so chunks live flattened in Steam_Chunks (ingestion.py --flatten-chunks)
+        vector_index = MongoChunkedVectorSearch(mongo_conn.db["Steam_Chunks"], aggregate=chunk_aggregate)
+    response_cache = SemanticResponseCache(
+        store=SQLiteResponseStore(os.environ.get("response_cache_path", "response_cache.db")),
+        threshold=float(os.environ.get("response_cache_threshold", 0.95)),
+    )
+    # Bare game titles skip the planner, routing and vector search
+    title_index = TitleIndex.from_vector_index(vector_index) if local_index \
+        else TitleIndex.from_collection(mongo_conn.db["Steam_Chunked"] if chunked else mongo_conn.collection)
+    # Precomputed neighbour graph (python similar_games.py steam_index) for "more like this" follow-ups
+    similar_path = os.environ.get("similar_games_path")
+    similar_index = SimilarGames.load(similar_path) if similar_path else None
+    # Retrieved games are fitted into this many prompt tokens; descriptions get trimmed first
+    context_token_budget = int(os.environ.get("context_token_budget", 800)) or None
+    # Every Gemini call goes through one gateway: concurrency cap, coalescing, retries, deadlines, breaker
+    from google import genai
+    gateway = LLMGateway(
+        genai.Client(api_key=os.environ.get("gemini_api_key")),
+        max_concurrency=int(os.environ.get("llm_max_concurrency", 8)),
+        timeout=float(os.environ.get("llm_timeout", 20)),
+        max_retries=int(os.environ.get("llm_max_retries", 3)),
+        breaker_threshold=int(os.environ.get("llm_breaker_threshold", 5)),
+        breaker_cooldown=float(os.environ.get("llm_breaker_cooldown", 30)),
+    )
+    model_response = ModelResponse(gemini_api_key=None, speculative=True, client=gateway,
+                                   response_cache=response_cache, title_index=title_index,
+                                   context_token_budget=context_token_budget, similar_index=similar_index)
+    # Per-stage latency traces feed the in-memory stats, an opt-in JSONL file
+    # and a Prometheus /metrics endpoint
+    if os.environ.get("trace_log_path"):
+        tracer.add_exporter(JsonlExporter(os.environ["trace_log_path"]))
+    if os.environ.get("metrics_port"):
+        start_metrics_server(tracer, port=int(os.environ["metrics_port"]))
+    embedding_model = encoder_future.result()
+    startup.shutdown()
+    if local_index:
+        # Touch the index once so the first query does not page it in
+        vector_index.search(embedding_model.get_embedding("warm up the index"), limit=1)
+    use_planner = os.environ.get("use_query_planner", "true").lower() == "true"
+    return Resources(mongo_conn, vector_index, embedding_model, model_response, use_planner=use_planner)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from search_filters import SearchFilter
+
+
+class InMemoryResponseStore:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def candidates(self, bucket):
+        with self._lock:
+            return [(entry_id, e["embedding"], e["response"], e["created_at"])
+                    for entry_id, e in self.entries.items() if e["bucket"] == bucket]
+
+    def add(self, bucket, embedding, response, now):
+        with self._lock:
+            self._next_id += 1
+            self.entries[self._next_id] = {"bucket": bucket, "embedding": embedding, "response": response, "created_at": now}
+
+    def touch(self, entry_id, now):
+        with self._lock:
+            if entry_id in self.entries:
+                self.entries.move_to_end(entry_id)
+
+    def expire(self, before):
+        with self._lock:
+            for entry_id in [i for i, e in self.entries.items() if e["created_at"] < before]:
+                del self.entries[entry_id]
+
+    def evict(self, max_entries):
+        with self._lock:
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+
+class SQLiteResponseStore:
+    def __init__(self, path="response_cache.db"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, bucket TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "response TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_bucket ON responses (bucket)")
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def candidates(self, bucket):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, embedding, response, created_at FROM responses WHERE bucket = ?", (bucket,)
+            ).fetchall()
+        return [(entry_id, np.frombuffer(blob, dtype=np.float32), response, created_at)
+                for entry_id, blob, response, created_at in rows]
+
+    def add(self, bucket, embedding, response, now):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO responses (bucket, embedding, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (bucket, np.asarray(embedding, dtype=np.float32).tobytes(), response, now, now),
+            )
+
+    def touch(self, entry_id, now):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE id = ?", (now, entry_id))
+
+    def expire(self, before):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (before,))
+
+    def evict(self, max_entries):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM responses WHERE id NOT IN (SELECT id FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (max_entries,),
+            )
+
+
+class SemanticResponseCache:
+    # Answers are reused only for the same normalized filters and the same set
+    # of retrieved games, and when the query embeddings are close enough.
+    def __init__(self, store=None, threshold=0.95, ttl=3600, max_entries=1000):
+        self.store = store if store is not None else InMemoryResponseStore()
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_bucket(filter_args, game_names):
+        filters = vars(SearchFilter.from_args(filter_args or {}))
+        key = json.dumps({"filters": filters, "games": sorted(game_names)}, sort_keys=True)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _unit(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, query_embedding, filter_args, game_names):
+        now = time.time()
+        self.store.expire(now - self.ttl)
+        candidates = self.store.candidates(self.make_bucket(filter_args, game_names))
+        if query_embedding is None or not candidates:
+            self._count(False)
+            return None
+
+        query = self._unit(query_embedding)
+        best_id, best_response, best_score = None, None, -1.0
+        for entry_id, embedding, response, _ in candidates:
+            score = float(np.dot(query, embedding))
+            if score > best_score:
+                best_id, best_response, best_score = entry_id, response, score
+
+        if best_score < self.threshold:
+            self._count(False)
+            return None
+        self.store.touch(best_id, now)
+        self._count(True)
+        return best_response
+
+    def add(self, query_embedding, filter_args, game_names, response):
+        if query_embedding is None:
+            return
+        self.store.add(self.make_bucket(filter_args, game_names), self._unit(query_embedding), response, time.time())
+        self.store.evict(self.max_entries)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.store),
+            }
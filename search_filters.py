@@ -0,0 +1,197 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+
+REVIEW_LABELS = ["Positive", "Mixed", "Negative"]
+
+# Normalized copies of the filterable game fields. They are stored on every
+# document and declared as "filter" paths in the Atlas vector index, so the
+# filters can run inside $vectorSearch instead of after it.
+FILTER_FIELDS = ["price_value", "release_year", "review_label", "developer_lc", "publisher_lc"]
+
+VECTOR_INDEX_DEFINITION = {
+    "fields": [
+        {"type": "vector", "path": "embedding", "numDimensions": 384, "similarity": "cosine"},
+        *[{"type": "filter", "path": field} for field in FILTER_FIELDS],
+    ]
+}
+
+
+def vector_index_definition(quantization=None):
+    # Atlas can keep "scalar" (int8) or "binary" codes in the index and
+    # rescore the numCandidates shortlist against the full-fidelity vectors
+    definition = {"fields": [dict(field) for field in VECTOR_INDEX_DEFINITION["fields"]]}
+    if quantization:
+        definition["fields"][0]["quantization"] = quantization
+    return definition
+
+
+def parse_price(price):
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        return None if price != price else float(price)
+    price_str = str(price or "").lower()
+    if "free" in price_str:
+        return 0.0
+    try:
+        return float(price_str.replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def parse_year(release_date):
+    if isinstance(release_date, datetime):
+        return release_date.year
+    if isinstance(release_date, str):
+        try:
+            return datetime.fromisoformat(release_date).year
+        except ValueError:
+            return None
+    return None
+
+
+def review_label(all_reviews):
+    reviews = str(all_reviews or "").lower()
+    for label in REVIEW_LABELS:
+        if label.lower() in reviews:
+            return label
+    return None
+
+
+def normalize_text(value):
+    if not isinstance(value, str):
+        return None
+    return value.strip().lower() or None
+
+
+def normalize_game_fields(game):
+    return {
+        "price_value": parse_price(game.get("price")),
+        "release_year": parse_year(game.get("release_date")),
+        "review_label": review_label(game.get("all_reviews")),
+        "developer_lc": normalize_text(game.get("developer")),
+        "publisher_lc": normalize_text(game.get("publisher")),
+    }
+
+
+def build_filter_columns(metadata):
+    # Column-oriented copy of the normalized fields for the local index
+    if all(field in metadata for field in FILTER_FIELDS):
+        # Typed columns stored by ingestion or preprocessing.py: nothing to parse
+        return {
+            "price_value": np.array([np.nan if v is None else v for v in metadata["price_value"]], dtype=np.float64),
+            "release_year": np.array([-1 if v is None else v for v in metadata["release_year"]], dtype=np.int32),
+            "review_label": np.array(metadata["review_label"], dtype=object),
+            "developer_lc": np.array(metadata["developer_lc"], dtype=object),
+            "publisher_lc": np.array(metadata["publisher_lc"], dtype=object),
+        }
+    size = len(next(iter(metadata.values()))) if metadata else 0
+    rows = [normalize_game_fields({column: values[i] for column, values in metadata.items()}) for i in range(size)]
+    return {
+        "price_value": np.array([r["price_value"] if r["price_value"] is not None else np.nan for r in rows], dtype=np.float64),
+        "release_year": np.array([r["release_year"] if r["release_year"] is not None else -1 for r in rows], dtype=np.int32),
+        "review_label": np.array([r["review_label"] for r in rows], dtype=object),
+        "developer_lc": np.array([r["developer_lc"] for r in rows], dtype=object),
+        "publisher_lc": np.array([r["publisher_lc"] for r in rows], dtype=object),
+    }
+
+
+class SearchFilter:
+    def __init__(self, year_range=None, price_limit=None, review_sentiment=None, developer=None, publisher=None):
+        self.year_range = [int(y) for y in year_range] if year_range else None
+        self.price_limit = float(price_limit) if price_limit is not None else None
+        self.review_sentiment = review_label(review_sentiment)
+        self.developer = normalize_text(developer)
+        self.publisher = normalize_text(publisher)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            year_range=args.get("year_range"),
+            price_limit=args.get("price_limit"),
+            review_sentiment=args.get("review_sentiment"),
+            developer=args.get("developer"),
+            publisher=args.get("publisher"),
+        )
+
+    def is_empty(self):
+        return not self.to_mongo()
+
+    def to_mongo(self):
+        clauses = []
+        if self.year_range:
+            clauses.append({"release_year": {"$gte": self.year_range[0], "$lte": self.year_range[-1]}})
+        if self.price_limit is not None:
+            clauses.append({"price_value": {"$lte": self.price_limit}})
+        if self.review_sentiment:
+            clauses.append({"review_label": {"$eq": self.review_sentiment}})
+        if self.developer:
+            clauses.append({"developer_lc": {"$eq": self.developer}})
+        if self.publisher:
+            clauses.append({"publisher_lc": {"$eq": self.publisher}})
+
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def matches(self, game):
+        fields = game if all(field in game for field in FILTER_FIELDS) else normalize_game_fields(game)
+        if self.year_range:
+            year = fields["release_year"]
+            if year is None or not (self.year_range[0] <= year <= self.year_range[-1]):
+                return False
+        if self.price_limit is not None:
+            price = fields["price_value"]
+            if price is None or price > self.price_limit:
+                return False
+        if self.review_sentiment and fields["review_label"] != self.review_sentiment:
+            return False
+        if self.developer and fields["developer_lc"] != self.developer:
+            return False
+        if self.publisher and fields["publisher_lc"] != self.publisher:
+            return False
+        return True
+
+    def mask(self, columns):
+        mask = np.ones(len(columns["price_value"]), dtype=bool)
+        if self.year_range:
+            years = columns["release_year"]
+            mask &= (years >= self.year_range[0]) & (years <= self.year_range[-1])
+        if self.price_limit is not None:
+            mask &= columns["price_value"] <= self.price_limit
+        if self.review_sentiment:
+            mask &= columns["review_label"] == self.review_sentiment
+        if self.developer:
+            mask &= columns["developer_lc"] == self.developer
+        if self.publisher:
+            mask &= columns["publisher_lc"] == self.publisher
+        return mask
+
+
+def backfill_filter_fields(collection, batch_size=1000):
+    from pymongo import UpdateOne
+
+    projection = {"price": 1, "release_date": 1, "all_reviews": 1, "developer": 1, "publisher": 1}
+    updates = []
+    updated = 0
+    for game in collection.find({}, projection, batch_size=batch_size):
+        updates.append(UpdateOne({"_id": game["_id"]}, {"$set": normalize_game_fields(game)}))
+        if len(updates) >= batch_size:
+            updated += collection.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        updated += collection.bulk_write(updates, ordered=False).modified_count
+    return updated
+
+
+if __name__ == "__main__":
+    # One-off migration: add the normalized filter fields to Steam_Embedding
+    # and redefine the "default" vector index with them as filter paths.
+    from pipeline import MongoDBConnection
+
+    mongo_conn = MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))
+    print(f"Updated {backfill_filter_fields(mongo_conn.collection)} documents")
+    quantization = os.environ.get("vector_index_quantization")  # "scalar" or "binary"
+    mongo_conn.collection.update_search_index("default", vector_index_definition(quantization))
+    print(f"Updated vector index 'default' with filter fields{f', {quantization} quantization' if quantization else ''}")
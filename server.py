@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import partial
+
+import numpy as np
+from aiohttp import web
+
+from chat_history import ChatHistory
+from search_filters import SearchFilter
+from tracing import tracer
+
+
+SEARCH_FILTERS = ["year_range", "price_limit", "review_sentiment", "developer", "publisher"]
+
+
+def json_default(value):
+    # Local index rows carry NumPy scalars and Mongo rows carry datetimes
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+json_response = partial(web.json_response, dumps=partial(json.dumps, default=json_default))
+
+
+def bad_request(message):
+    return json_response({"error": message}, status=400)
+
+
+async def read_body(request):
+    # The JSON object posted, or None when the body is not one
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return body if isinstance(body, dict) else None
+
+
+class ChatServer:
+    # Headless HTTP API over one shared Resources: one Mongo client pool, one
+    # encoder (micro-batched across requests) and one genai client serve every
+    # session. Turns are blocking pipeline calls, so they run on a thread pool
+    # while the event loop only does I/O.
+    def __init__(self, resources, workers=32, max_sessions=10000):
+        self.resources = resources
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post("/chat", self.chat),
+            web.post("/search", self.search),
+            web.get("/health", self.health),
+        ])
+        app.on_cleanup.append(self._shutdown)
+        return app
+
+    async def _shutdown(self, app):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _history(self, session_id):
+        # Oldest idle sessions are forgotten once max_sessions is reached
+        history = self.sessions.pop(session_id, None)
+        if history is None:
+            history = ChatHistory()
+        self.sessions[session_id] = history
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return history
+
+    def _run_turn(self, session_id, history, prompt, on_chunk=None):
+        with history.lock, tracer.trace("turn", session_id=session_id, history_turns=len(history)) as trace:
+            query, plan, title_matches = self.resources.plan_turn(history, prompt)
+            history.add_user(prompt)
+            chunks = []
+            try:
+                for chunk in self.resources.stream_turn(query, plan, title_matches, on_retrieval=history.record_retrieval):
+                    chunks.append(chunk)
+                    if on_chunk is not None:
+                        on_chunk(chunk)
+            finally:
+                # Even a failed turn gets an assistant entry so the history stays in user/assistant pairs
+                history.add_assistant("".join(chunks))
+        return "".join(chunks), trace
+
+    def _run_search(self, query, top_k, filters):
+        # Traced on the worker thread so the pipeline spans land in this trace
+        with tracer.trace("search", filtered=bool(filters)) as trace:
+            results = self.resources.search(query, top_k=top_k, **filters)
+        return results, trace
+
+    async def chat(self, request):
+        # {"message": ..., "session_id": optional, "stream": optional}
+        body = await read_body(request)
+        if body is None:
+            return bad_request("body must be a JSON object")
+        prompt = body.get("message")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return bad_request("message is required")
+        prompt = prompt.strip()
+        session_id = str(body.get("session_id") or uuid.uuid4())
+        history = self._history(session_id)
+        loop = asyncio.get_running_loop()
+
+        if not body.get("stream"):
+            try:
+                text, trace = await loop.run_in_executor(self.executor, self._run_turn, session_id, history, prompt)
+            except Exception as e:
+                return json_response({"session_id": session_id, "error": str(e)}, status=500)
+            return json_response({"session_id": session_id, "response": text,
+                                  "latency_ms": round(trace.duration_ms, 1)})
+
+        # Streamed answer: chunks cross from the worker thread to the event loop through a queue
+        response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8",
+                                               "X-Session-Id": session_id})
+        await response.prepare(request)
+        chunks = asyncio.Queue()
+        done = object()
+
+        def on_chunk(chunk):
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        turn = loop.run_in_executor(self.executor, self._run_turn, session_id, history, prompt, on_chunk)
+        turn.add_done_callback(lambda _: chunks.put_nowait(done))
+        while (chunk := await chunks.get()) is not done:
+            await response.write(chunk.encode("utf-8"))
+        try:
+            await turn
+        except Exception as e:
+            await response.write(f"\n❌ Error: {e}".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def search(self, request):
+        # {"query": ..., "top_k": 3, plus any smart_vector_search filter}
+        body = await read_body(request)
+        if body is None:
+            return bad_request("body must be a JSON object")
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            return bad_request("query is required")
+        try:
+            top_k = int(body.get("top_k", 3))
+        except (TypeError, ValueError):
+            return bad_request("top_k must be an integer")
+        if top_k < 1:
+            return bad_request("top_k must be at least 1")
+        filters = {name: body[name] for name in SEARCH_FILTERS if body.get(name) is not None}
+        try:
+            SearchFilter(**filters)
+        except (TypeError, ValueError) as e:
+            return bad_request(f"invalid filter: {e}")
+        loop = asyncio.get_running_loop()
+        try:
+            results, trace = await loop.run_in_executor(self.executor, self._run_search, query.strip(), top_k, filters)
+        except Exception as e:
+            return json_response({"error": str(e)}, status=500)
+        return json_response({"results": results, "latency_ms": round(trace.duration_ms, 1)})
+
+    async def health(self, request):
+        encoder = self.resources.embedding_model.embedding_model
+        gateway = self.resources.model_response.client
+        return json_response({
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "embedding_cache": self.resources.embedding_model.cache_info(),
+            "micro_batching": encoder.stats() if hasattr(encoder, "stats") else None,
+            "llm_gateway": gateway.metrics() if hasattr(gateway, "metrics") else None,
+        })
+
+
+if __name__ == "__main__":
+    # python server.py --port 8080
+    #   curl -d '{"message": "cozy farming games"}' localhost:8080/chat
+    from resources import load_resources
+
+    parser = argparse.ArgumentParser(description="Serve the recommender over HTTP for many concurrent users")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32, help="Threads running pipeline turns")
+    parser.add_argument("--micro-batch-ms", type=float, default=float(os.environ.get("micro_batch_window_ms", 5)),
+                        help="Window for merging concurrent query encodes (0 disables)")
+    args = parser.parse_args()
+
+    server = ChatServer(load_resources(micro_batch_ms=args.micro_batch_ms), workers=args.workers)
+    web.run_app(server.app(), host=args.host, port=args.port)
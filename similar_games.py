@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from search_filters import build_filter_columns
+from title_index import normalize_title
+from vector_index import LocalVectorIndex, top_k_rows
+
+
+ORDINALS = {"first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2, "fourth": 3, "4th": 3,
+            "fifth": 4, "5th": 4, "last": -1}
+# A follow-up that only points at a game: "something like the second one", "more like Hades".
+# Anything with extra constraints ("...but cheaper") goes through the planner instead.
+SIMILAR_REQUEST = re.compile(
+    r"^(?:(?:show|give|find|recommend|suggest)\s+me\s+)?(?:some|something|more|other|anything|any)?\s*"
+    r"(?:games?\s+)?(?:like|similar\s+to)\s+(?:the\s+)?(?P<target>.+?)(?:\s+one|\s+game)?\s*[.!?]*$",
+    re.IGNORECASE,
+)
+POINTERS = {"that", "this", "it"}
+
+
+def knn_graph(embeddings, k=30, block_size=2048):
+    # Exact k nearest neighbours of every row by cosine, one block_size x
+    # block_size score tile at a time: memory stays O(block_size^2 + n*k) and
+    # the (memory-mapped) unit vectors are read block by block
+    n = len(embeddings)
+    k = min(k, n - 1)
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+    for start in range(0, n, block_size):
+        rows = np.asarray(embeddings[start:start + block_size], dtype=np.float32)
+        best_scores = np.full((len(rows), 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((len(rows), 0), dtype=np.int64)
+        for col in range(0, n, block_size):
+            tile = rows @ np.asarray(embeddings[col:col + block_size], dtype=np.float32).T
+            if col == start:
+                np.fill_diagonal(tile, -np.inf)  # a game is not its own neighbour
+            # Keep each row's k best of this tile, then merge with the running best
+            top = top_k_rows(tile, k)
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(tile, top, axis=1)], axis=1)
+            merged_ids = np.concatenate([best_ids, top + col], axis=1)
+            top = top_k_rows(merged_scores, k)
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_ids = np.take_along_axis(merged_ids, top, axis=1)
+        neighbors[start:start + len(rows)] = best_ids
+        scores[start:start + len(rows)] = best_scores
+    return neighbors, scores
+
+
+def parse_similar_request(text, last_games):
+    # The game a "more like this" follow-up points at: an ordinal into the
+    # previous answer's games, "that one" when it had a single game, or a title
+    match = SIMILAR_REQUEST.match(" ".join((text or "").split()))
+    if not match:
+        return None
+    target = match.group("target").lower()
+    if target in ORDINALS:
+        index = ORDINALS[target]
+        return last_games[index] if last_games and index < len(last_games) else None
+    if target in POINTERS:
+        return last_games[0] if len(last_games or []) == 1 else None
+    return match.group("target")
+
+
+class SimilarGames:
+    # Precomputed "more like this" graph stored next to a local index snapshot:
+    # row i of neighbors holds the ids of the k games closest to game i, best
+    # first, with their cosines in scores. Lookups read one row and apply
+    # filters to those k games only, so no embedding or search is needed.
+    def __init__(self, neighbors, scores, metadata, ids=None):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.metadata = metadata
+        if len(neighbors) != len(metadata["name"]):
+            raise ValueError(f"graph has {len(neighbors)} rows, metadata has {len(metadata['name'])} games")
+        if ids is None:
+            # First game wins when two titles normalize the same
+            ids = {}
+            for i, name in enumerate(metadata["name"]):
+                ids.setdefault(normalize_title(name), i)
+        self.ids = ids
+        self.filter_columns = build_filter_columns(metadata)
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(cls, index, k=30, block_size=2048):
+        neighbors, scores = knn_graph(index.embeddings, k=k, block_size=block_size)
+        return cls(neighbors, scores, index.metadata)
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "similar_neighbors.npy"), self.neighbors)
+        np.save(os.path.join(directory, "similar_scores.npy"), self.scores)
+        with open(os.path.join(directory, "similar_names.json"), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        mode = "r" if mmap else None
+        with open(os.path.join(directory, "similar_names.json"), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(np.load(os.path.join(directory, "similar_neighbors.npy"), mmap_mode=mode),
+                   np.load(os.path.join(directory, "similar_scores.npy"), mmap_mode=mode),
+                   LocalVectorIndex.load_metadata(directory), ids=ids)
+
+    def find(self, name):
+        return self.ids.get(normalize_title(name))
+
+    def row(self, i):
+        return {column: values[i] for column, values in self.metadata.items()}
+
+    def similar(self, game, limit=5, search_filter=None):
+        # game is a title or a row id; filters only see the k stored neighbours
+        row = self.find(game) if isinstance(game, str) else game
+        if row is None:
+            return []
+        ids = np.asarray(self.neighbors[row])
+        scores = np.asarray(self.scores[row], dtype=np.float32)
+        if search_filter is not None and not search_filter.is_empty():
+            keep = search_filter.mask({name: column[ids] for name, column in self.filter_columns.items()})
+            ids, scores = ids[keep], scores[keep]
+        # Same scale as the vectorSearchScore of the other retrieval paths
+        return [dict(self.row(i), score=float((1 + s) / 2)) for i, s in zip(ids[:limit], scores[:limit])]
+
+
+if __name__ == "__main__":
+    # Precompute the graph into a local index snapshot (built from Steam_Embedding when missing):
+    #   python similar_games.py steam_index --k 30
+    parser = argparse.ArgumentParser(description="Precompute the similar-games graph for a local index snapshot")
+    parser.add_argument("index_dir", nargs="?", default="steam_index")
+    parser.add_argument("--k", type=int, default=30, help="Neighbours kept per game")
+    parser.add_argument("--block-size", type=int, default=2048, help="Rows and columns per score tile")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.index_dir, "embeddings.npy")):
+        from pipeline import MongoDBConnection
+
+        mongo_conn = MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))
+        LocalVectorIndex.from_collection(mongo_conn.collection).save(args.index_dir)
+        print(f"Saved the Steam_Embedding vectors to {args.index_dir}")
+    started = time.perf_counter()
+    graph = SimilarGames.build(LocalVectorIndex.load(args.index_dir), k=args.k, block_size=args.block_size)
+    graph.save(args.index_dir)
+    print(f"Saved {graph.k} neighbours for each of {len(graph)} games in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,194 @@
+import re
+from collections import defaultdict
+
+from vector_index import GAME_FIELDS
+
+
+TRADEMARKS = re.compile(r"[™®©]")
+NON_WORD = re.compile(r"[^a-z0-9]+")
+LEADING_ARTICLE = re.compile(r"^the ")
+# Lead-ins people type before a bare title
+LEAD_INS = ["tell me about", "what about", "what is", "info on", "details on", "show me", "search for", "look up"]
+# Words that mean the user wants recommendations or is chatting, not naming a game
+INTENT_WORDS = {"like", "similar", "recommend", "recommendation", "recommendations", "games", "suggest", "under",
+                "cheap", "best", "top", "play", "want", "looking", "any", "some", "with", "about", "released",
+                "hi", "hello", "hey", "thanks", "thank", "bye", "goodbye", "ok", "okay", "yes", "no"}
+
+
+def normalize_title(text):
+    # "The Witcher® 3: Wild Hunt" -> "witcher 3 wild hunt"
+    return LEADING_ARTICLE.sub("", NON_WORD.sub(" ", TRADEMARKS.sub("", text or "").lower()).strip())
+
+
+def bounded_edit_distance(a, b, bound):
+    # Levenshtein distance, or bound + 1 as soon as it must exceed bound
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+def max_distance(text):
+    # Typos tolerated grow with length; very short words must match exactly
+    return 0 if len(text) < 4 else 1 if len(text) <= 8 else 2
+
+
+class TokenTrie:
+    # Character trie over the title vocabulary for prefix and fuzzy token lookups
+    END = None
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[self.END] = word
+
+    def prefix(self, word, limit=50):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return []
+        words, stack = [], [node]
+        while stack and len(words) < limit:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is self.END:
+                    words.append(child)
+                else:
+                    stack.append(child)
+        return words
+
+    def fuzzy(self, word, max_distance):
+        # Walks the trie carrying one Levenshtein DP row per node and prunes
+        # branches whose row minimum already exceeds max_distance
+        matches = []
+        first_row = list(range(len(word) + 1))
+        stack = [(child, char, first_row) for char, child in self.root.items() if char is not self.END]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for j in range(1, len(word) + 1):
+                row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (word[j - 1] != char)))
+            if self.END in node and row[-1] <= max_distance:
+                matches.append((node[self.END], row[-1]))
+            if min(row) <= max_distance:
+                stack.extend((child, c, row) for c, child in node.items() if c is not self.END)
+        return matches
+
+
+class TitleIndex:
+    # In-memory index over the catalog's name field that resolves queries which
+    # are (nearly) a game title straight to documents, skipping the LLM router
+    # and the vector search.
+    def __init__(self, names, fetch, generic_df=None, max_query_tokens=8, max_candidates=500):
+        self.fetch = fetch
+        self.max_query_tokens = max_query_tokens
+        self.max_candidates = max_candidates
+        self.titles = [normalize_title(name) for name in names]
+        # A token in more than ~0.1% of the catalog is a genre word, not part of a title
+        self.generic_df = generic_df if generic_df is not None else max(5, len(self.titles) // 1000)
+        self.exact = defaultdict(list)
+        self.postings = defaultdict(set)
+        self.trie = TokenTrie()
+        for row, title in enumerate(self.titles):
+            if not title:
+                continue
+            self.exact[title].append(row)
+            for token in title.split():
+                if token not in self.postings:
+                    self.trie.insert(token)
+                self.postings[token].add(row)
+
+    def __len__(self):
+        return len(self.exact)
+
+    @classmethod
+    def from_vector_index(cls, index, **kwargs):
+        return cls(index.metadata["name"], index.row, **kwargs)
+
+    @classmethod
+    def from_collection(cls, collection, batch_size=1000, **kwargs):
+        projection = {"_id": 0, **{field: 1 for field in GAME_FIELDS}}
+        documents = [doc for doc in collection.find({}, projection, batch_size=batch_size) if doc.get("name")]
+        return cls([doc["name"] for doc in documents], documents.__getitem__, **kwargs)
+
+    def _strip_lead_in(self, query):
+        for lead_in in LEAD_INS:
+            if query.startswith(lead_in + " "):
+                return query[len(lead_in) + 1:]
+        return query
+
+    def _unfinished(self, token):
+        # A complete vocabulary word ("fall", "souls") is never completed to a longer one
+        return len(token) >= 3 and token not in self.postings
+
+    def _candidates(self, tokens):
+        # Rows whose title has every query token, each allowed a bounded typo;
+        # the last token may also be an unfinished word ("counter str")
+        rows = None
+        for i, token in enumerate(tokens):
+            words = {word for word, _ in self.trie.fuzzy(token, max_distance(token))}
+            if i == len(tokens) - 1 and self._unfinished(token):
+                words.update(self.trie.prefix(token))
+            matched = set()
+            for word in words:
+                matched |= self.postings[word]
+            rows = matched if rows is None else rows & matched
+            if not rows:
+                return set()
+        return rows
+
+    def match(self, query, top_k=3):
+        # Returns [(row, kind)] for a confident title query, else []
+        query = normalize_title(self._strip_lead_in(normalize_title(query)))
+        tokens = query.split()
+        if not tokens or len(tokens) > self.max_query_tokens or INTENT_WORDS & set(tokens):
+            return []
+        # Every token being common means a description ("racing", "space shooter"), not a title
+        if all(len(self.postings.get(t, ())) > self.generic_df for t in tokens):
+            return []
+
+        if query in self.exact:
+            return [(row, "exact") for row in self.exact[query][:top_k]]
+
+        rows = self._candidates(tokens)
+        if not rows or len(rows) > self.max_candidates:
+            return []
+
+        bound = max_distance(query)
+        fuzzy = defaultdict(list)
+        prefixed = []
+        complete = self._unfinished(tokens[-1])
+        for row in rows:
+            title = self.titles[row]
+            distance = bounded_edit_distance(query, title, bound)
+            if distance <= bound:
+                fuzzy[distance].append(row)
+            elif complete and title.startswith(query):
+                prefixed.append(row)
+
+        if fuzzy:
+            best = fuzzy[min(fuzzy)]
+            # Only confident when the closest rows all share one title
+            if len({self.titles[row] for row in best}) == 1:
+                return [(row, "fuzzy") for row in best[:top_k]]
+            return []
+        if prefixed:
+            # "counter str" -> the shortest titles that extend the query
+            prefixed.sort(key=lambda row: (len(self.titles[row]), row))
+            return [(row, "prefix") for row in prefixed[:top_k]]
+        return []
+
+    def lookup(self, query, top_k=3):
+        return [self.fetch(row) for row, _ in self.match(query, top_k)]
@@ -0,0 +1,185 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self.duration_ms = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            **self.attrs,
+            "spans": spans,
+        }
+
+
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class Tracer:
+    def __init__(self, exporters=None, keep_traces=50):
+        self.exporters = list(exporters or [])
+        self.keep_traces = keep_traces
+        self.traces = []
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    @property
+    def last_trace(self):
+        with self._lock:
+            return self.traces[-1] if self.traces else None
+
+    @contextmanager
+    def trace(self, name, **attrs):
+        trace = Trace(name, attrs)
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace.duration_ms = (time.perf_counter() - started) * 1000
+            _current_trace.reset(token)
+            with self._lock:
+                self.traces = (self.traces + [trace])[-self.keep_traces:]
+            for exporter in self.exporters:
+                try:
+                    exporter.export(trace)
+                except Exception as e:
+                    print(f"Trace export failed: {e}")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = Span(name, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(span)
+            self._record(span)
+
+    def _record(self, span):
+        seconds = span.duration_ms / 1000
+        with self._lock:
+            stat = self.stats.setdefault(span.name, {
+                "count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * len(DURATION_BUCKETS),
+            })
+            stat["count"] += 1
+            stat["sum"] += seconds
+            stat["errors"] += span.error is not None
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stat["buckets"][i] += 1
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP rag_stage_duration_seconds Duration of each RAG pipeline stage.",
+            "# TYPE rag_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            stats = {name: dict(stat, buckets=list(stat["buckets"])) for name, stat in self.stats.items()}
+        for name, stat in sorted(stats.items()):
+            for bound, count in zip(DURATION_BUCKETS, stat["buckets"]):
+                lines.append(f'rag_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'rag_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stat["count"]}')
+            lines.append(f'rag_stage_duration_seconds_sum{{stage="{name}"}} {stat["sum"]:.6f}')
+            lines.append(f'rag_stage_duration_seconds_count{{stage="{name}"}} {stat["count"]}')
+        lines.append("# HELP rag_stage_errors_total Stages that raised an exception.")
+        lines.append("# TYPE rag_stage_errors_total counter")
+        for name, stat in sorted(stats.items()):
+            lines.append(f'rag_stage_errors_total{{stage="{name}"}} {stat["errors"]}')
+        return "\n".join(lines) + "\n"
+
+
+def run_in_context(executor, fn, *args):
+    # Submit to a thread pool without losing the active trace
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args)
+
+
+def start_metrics_server(tracer, port=9464, host="0.0.0.0"):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving pipeline metrics on http://{host}:{port}/metrics")
+    return server
+
+
+tracer = Tracer()
@@ -0,0 +1,470 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from search_filters import FILTER_FIELDS, build_filter_columns
+
+
+GAME_FIELDS = ["name", "description", "all_reviews", "release_date", "developer", "publisher", "price"]
+DATE_FIELDS = ["release_date"]
+METADATA_FORMATS = ["json", "parquet"]
+# How chunk scores combine into a game score
+CHUNK_AGGREGATES = ["max", "sum"]
+# BSON binary subtype for packed vectors
+VECTOR_SUBTYPE = 9
+
+
+def to_vector(value):
+    # Embeddings are stored either as plain arrays or as BSON binData float32 vectors
+    if isinstance(value, bytes) and getattr(value, "subtype", None) == VECTOR_SUBTYPE:
+        return np.asarray(value.as_vector().data, dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def top_k_rows(scores, k):
+    # Column indices of the k best scores per row, best first
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(scores), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def keep_typed_fields(metadata, typed):
+    # The stored filter fields are only used when every game has them; older
+    # documents get them derived from the raw fields by build_filter_columns
+    if not typed:
+        for field in FILTER_FIELDS:
+            del metadata[field]
+    return metadata
+
+
+class MongoVectorSearch:
+    exact = False
+
+    def __init__(self, collection, index="default", path="embedding"):
+        self.collection = collection
+        self.index = index
+        self.path = path
+
+    def _vector_search_stage(self, query_vector, limit, num_candidates, search_filter):
+        vector_search = {
+            "index": self.index,
+            "queryVector": np.asarray(query_vector, dtype=np.float64).tolist(),
+            "path": self.path,
+            "numCandidates": num_candidates,
+            "limit": limit,
+        }
+        if search_filter is not None and not search_filter.is_empty():
+            vector_search["filter"] = search_filter.to_mongo()
+        return {"$vectorSearch": vector_search}
+
+    def search(self, query_vector, limit=100, num_candidates=400, search_filter=None):
+        pipeline = [
+            self._vector_search_stage(query_vector, limit, num_candidates, search_filter),
+            {"$unset": self.path},
+            {
+                "$project": {
+                    "_id": 0,
+                    **{field: 1 for field in GAME_FIELDS + FILTER_FIELDS},
+                    "score": {"$meta": "vectorSearchScore"},
+                }
+            }
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+
+class MongoChunkedVectorSearch(MongoVectorSearch):
+    # $vectorSearch over a flattened chunk collection (one document per chunk
+    # vector, game fields copied onto each; see ingestion.flatten_chunks), with
+    # chunk hits grouped into games before the top-k cut.
+    def __init__(self, collection, index="default", path="embedding", game_key="game_id", aggregate="max",
+                 overfetch=8):
+        super().__init__(collection, index=index, path=path)
+        if aggregate not in CHUNK_AGGREGATES:
+            raise ValueError(f"Unknown chunk aggregate '{aggregate}', expected one of {CHUNK_AGGREGATES}")
+        self.game_key = game_key
+        self.aggregate = aggregate
+        self.overfetch = overfetch
+
+    def search(self, query_vector, limit=100, num_candidates=400, search_filter=None):
+        # Several chunks of one game can fill the chunk limit, so fetch more chunks than games
+        chunk_limit = max(limit, min(limit * self.overfetch, num_candidates))
+        pipeline = [
+            self._vector_search_stage(query_vector, chunk_limit, max(num_candidates, chunk_limit), search_filter),
+            {
+                "$project": {
+                    "_id": 0,
+                    self.game_key: 1,
+                    **{field: 1 for field in GAME_FIELDS + FILTER_FIELDS},
+                    "score": {"$meta": "vectorSearchScore"},
+                }
+            },
+            {
+                "$group": {
+                    "_id": f"${self.game_key}",
+                    "score": {f"${self.aggregate}": "$score"},
+                    **{field: {"$first": f"${field}"} for field in GAME_FIELDS + FILTER_FIELDS},
+                }
+            },
+            {"$sort": {"score": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0}},
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+
+class LocalVectorIndex:
+    # In-process replacement for the Atlas $vectorSearch stage: one contiguous
+    # float32 matrix of unit vectors plus metadata columns aligned by row.
+    exact = True
+
+    def __init__(self, embeddings, metadata):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.metadata = metadata
+        if self.embeddings.ndim != 2:
+            raise ValueError("embeddings must be a 2-D matrix")
+        for column, values in metadata.items():
+            if len(values) != len(self):
+                raise ValueError(f"metadata column '{column}' has {len(values)} rows, expected {len(self)}")
+        self.filter_columns = build_filter_columns(metadata)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    @property
+    def dim(self):
+        return self.embeddings.shape[1]
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @classmethod
+    def from_collection(cls, collection, path="embedding", batch_size=1000):
+        rows = []
+        metadata = {field: [] for field in GAME_FIELDS + FILTER_FIELDS}
+        typed = True
+        cursor = collection.find(
+            {path: {"$exists": True}},
+            {"_id": 0, path: 1, **{field: 1 for field in GAME_FIELDS + FILTER_FIELDS}},
+            batch_size=batch_size,
+        )
+        for doc in cursor:
+            vector = doc.get(path)
+            if not vector:
+                continue
+            rows.append(to_vector(vector))
+            typed = typed and all(field in doc for field in FILTER_FIELDS)
+            for field in metadata:
+                metadata[field].append(doc.get(field))
+
+        if not rows:
+            raise ValueError("No embedded documents found in collection")
+        return cls(cls._normalize(np.vstack(rows)), keep_typed_fields(metadata, typed))
+
+    def save(self, directory, metadata_format="json"):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "embeddings.npy"), self.embeddings)
+        # load() prefers metadata.parquet, so never leave one format behind the other
+        stale = os.path.join(directory, "metadata.json" if metadata_format == "parquet" else "metadata.parquet")
+        if os.path.exists(stale):
+            os.remove(stale)
+
+        if metadata_format == "parquet":
+            # Columnar and typed: loads faster than JSON for large catalogs
+            import pandas as pd
+
+            pd.DataFrame({column: list(values) for column, values in self.metadata.items()}).to_parquet(
+                os.path.join(directory, "metadata.parquet"), index=False)
+            return
+        columns = {}
+        for column, values in self.metadata.items():
+            if column in DATE_FIELDS:
+                values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+            columns[column] = list(values)
+        with open(os.path.join(directory, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(columns, f)
+
+    @staticmethod
+    def load_metadata(directory):
+        parquet_path = os.path.join(directory, "metadata.parquet")
+        if os.path.exists(parquet_path):
+            import pandas as pd
+
+            frame = pd.read_parquet(parquet_path)
+            return {column: frame[column].astype(object).where(frame[column].notna(), None).tolist() for column in frame}
+        with open(os.path.join(directory, "metadata.json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        for column in DATE_FIELDS:
+            if column in metadata:
+                metadata[column] = [datetime.fromisoformat(v) if isinstance(v, str) else v for v in metadata[column]]
+        return metadata
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        return cls(embeddings, cls.load_metadata(directory))
+
+    def row(self, i):
+        return {column: values[i] for column, values in self.metadata.items()}
+
+    def search_batch(self, query_vectors, limit=100, mask=None):
+        queries = self._normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        scores = queries @ self.embeddings.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        top = top_k_rows(scores, limit)
+        return [self._hits(top[q], scores[q, top[q]]) for q in range(len(queries))]
+
+    def _hits(self, rows, values, cosine=True):
+        hits = []
+        for i, value in zip(rows, values):
+            if not np.isfinite(value):
+                break
+            game = self.row(i)
+            # Same scale as Atlas vectorSearchScore for cosine similarity
+            game["score"] = float((1 + value) / 2) if cosine else float(value)
+            hits.append(game)
+        return hits
+
+    def search(self, query_vector, limit=100, num_candidates=None, search_filter=None):
+        # num_candidates is accepted for interface parity with MongoVectorSearch;
+        # the local search is exact, so every row is a candidate.
+        mask = None
+        if search_filter is not None and not search_filter.is_empty():
+            mask = search_filter.mask(self.filter_columns)
+        return self.search_batch(query_vector, limit=limit, mask=mask)[0]
+
+
+QUANTIZATION_MODES = ["int8", "binary"]
+# Shortlist size as a multiple of the limit; binary codes are coarse and
+# need a much longer shortlist to recover recall in the float32 rescoring
+RESCORE_FACTORS = {"int8": 4, "binary": 100}
+
+
+def popcount64(x):
+    # SWAR bit count per uint64 lane; NumPy 1.x has no popcount ufunc
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def binarize(vectors, center):
+    # Bits are taken around the catalog mean so skewed dimensions still split
+    # rows evenly; rows are padded to whole uint64 words for popcount64
+    bits = np.packbits(vectors > center, axis=1)
+    pad = -bits.shape[1] % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def quantize(embeddings, mode):
+    # Compact codes plus whatever is needed to score a query against them
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if mode == "int8":
+        # Symmetric per-dimension scale calibrated on the catalog itself
+        scale = np.abs(embeddings).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+        return codes, {"scale": scale.astype(np.float32)}
+    if mode == "binary":
+        center = embeddings.mean(axis=0)
+        return binarize(embeddings, center), {"center": center}
+    raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+
+
+class QuantizedVectorIndex(LocalVectorIndex):
+    # Two-pass search: approximate scores over compact codes held in RAM pick
+    # a shortlist, then exact float32 cosines rescore only those rows. The
+    # float32 matrix can stay memory-mapped since only shortlisted rows are read.
+    # Filters apply to the first pass, so results stay complete and the
+    # inherited exact=True (no candidate widening) still holds.
+    def __init__(self, embeddings, metadata, mode="int8", codes=None, params=None, rescore_factor=None,
+                 block_size=2048):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+        super().__init__(embeddings, metadata)
+        self.mode = mode
+        if codes is None:
+            codes, params = quantize(self.embeddings, mode)
+        self.codes = codes
+        self.params = params or {}
+        self.rescore_factor = rescore_factor or RESCORE_FACTORS[mode]
+        self.block_size = block_size
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(np.asarray(v).nbytes for v in self.params.values())
+
+    @classmethod
+    def from_index(cls, index, mode="int8", **kwargs):
+        return cls(index.embeddings, index.metadata, mode=mode, **kwargs)
+
+    def save(self, directory, metadata_format="json"):
+        super().save(directory, metadata_format)
+        np.save(os.path.join(directory, f"codes_{self.mode}.npy"), self.codes)
+        for name, value in self.params.items():
+            np.save(os.path.join(directory, f"{name}_{self.mode}.npy"), value)
+
+    @classmethod
+    def load(cls, directory, mode="int8", mmap=True, **kwargs):
+        index = LocalVectorIndex.load(directory, mmap=mmap)
+        codes_path = os.path.join(directory, f"codes_{mode}.npy")
+        if not os.path.exists(codes_path):
+            return cls.from_index(index, mode=mode, **kwargs)
+        params = {}
+        for name in ("scale", "center"):
+            path = os.path.join(directory, f"{name}_{mode}.npy")
+            if os.path.exists(path):
+                params[name] = np.load(path)
+        return cls(index.embeddings, index.metadata, mode=mode, codes=np.load(codes_path), params=params, **kwargs)
+
+    def approximate_scores(self, queries):
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        if self.mode == "binary":
+            query_bits = binarize(queries, self.params["center"])
+        elif self.mode == "int8":
+            queries = queries * self.params["scale"]
+        for start in range(0, len(self), self.block_size):
+            block = self.codes[start:start + self.block_size]
+            if self.mode == "binary":
+                # Negative Hamming distance over 64-bit words
+                for q, bits in enumerate(query_bits):
+                    scores[q, start:start + len(block)] = -popcount64(block ^ bits).sum(axis=1).astype(np.int64)
+            else:
+                # int8 -> float32 costs about what reading float32 rows would; a
+                # float16 upcast costs several times that, which is why there
+                # is no float16 mode
+                scores[:, start:start + len(block)] = queries @ block.astype(np.float32).T
+        return scores
+
+    def search_batch(self, query_vectors, limit=100, mask=None, num_candidates=None):
+        queries = self._normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        scores = self.approximate_scores(queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        shortlist = min(max(limit * self.rescore_factor, num_candidates or 0), len(self))
+        if min(limit, shortlist) == 0:
+            return [[] for _ in range(len(queries))]
+        candidates = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+
+        results = []
+        for q, rows in enumerate(candidates):
+            rows = rows[np.isfinite(scores[q, rows])]
+            rows.sort()  # sequential reads from the memory-mapped matrix
+            cosines = self.embeddings[rows] @ queries[q]
+            order = np.argsort(-cosines)[:limit]
+            results.append(self._hits(rows[order], cosines[order]))
+        return results
+
+    def search(self, query_vector, limit=100, num_candidates=None, search_filter=None):
+        # num_candidates widens the rescoring shortlist, like numCandidates in Atlas
+        mask = None
+        if search_filter is not None and not search_filter.is_empty():
+            mask = search_filter.mask(self.filter_columns)
+        return self.search_batch(query_vector, limit=limit, mask=mask, num_candidates=num_candidates)[0]
+
+
+class ChunkedVectorIndex(LocalVectorIndex):
+    # Several unit vectors per game stored back to back; chunk_offsets[g] is the
+    # first chunk row of game g. Chunk scores are reduced per game (max or sum
+    # of the Atlas-scale scores) before filters and the top-k cut.
+    def __init__(self, embeddings, metadata, chunk_offsets, aggregate="max"):
+        if aggregate not in CHUNK_AGGREGATES:
+            raise ValueError(f"Unknown chunk aggregate '{aggregate}', expected one of {CHUNK_AGGREGATES}")
+        self.chunk_offsets = np.asarray(chunk_offsets, dtype=np.int64)
+        self.aggregate = aggregate
+        super().__init__(embeddings, metadata)
+        if len(self.chunk_offsets) and (self.chunk_offsets[0] != 0 or np.any(np.diff(self.chunk_offsets) <= 0)):
+            raise ValueError("chunk_offsets must start at 0 and give every game at least one chunk")
+
+    def __len__(self):
+        return len(self.chunk_offsets)
+
+    @property
+    def chunk_count(self):
+        return self.embeddings.shape[0]
+
+    @classmethod
+    def from_collection(cls, collection, path="embedding_chunks", batch_size=200, aggregate="max"):
+        rows = []
+        offsets = []
+        metadata = {field: [] for field in GAME_FIELDS + FILTER_FIELDS}
+        typed = True
+        cursor = collection.find(
+            {path: {"$exists": True}},
+            {"_id": 0, path: 1, **{field: 1 for field in GAME_FIELDS + FILTER_FIELDS}},
+            batch_size=batch_size,
+        )
+        for doc in cursor:
+            # The notebook stores [] for chunks it could not embed
+            chunks = [to_vector(chunk) for chunk in doc.get(path) or [] if len(chunk)]
+            if not chunks:
+                continue
+            offsets.append(len(rows))
+            rows.extend(chunks)
+            typed = typed and all(field in doc for field in FILTER_FIELDS)
+            for field in metadata:
+                metadata[field].append(doc.get(field))
+
+        if not rows:
+            raise ValueError("No chunk embeddings found in collection")
+        return cls(cls._normalize(np.vstack(rows)), keep_typed_fields(metadata, typed), offsets, aggregate=aggregate)
+
+    def save(self, directory, metadata_format="json"):
+        super().save(directory, metadata_format)
+        np.save(os.path.join(directory, "chunk_offsets.npy"), self.chunk_offsets)
+
+    @classmethod
+    def load(cls, directory, mmap=True, aggregate="max"):
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        offsets = np.load(os.path.join(directory, "chunk_offsets.npy"))
+        metadata = LocalVectorIndex.load_metadata(directory)
+        return cls(embeddings, metadata, offsets, aggregate=aggregate)
+
+    def search_batch(self, query_vectors, limit=100, mask=None):
+        queries = self._normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        chunk_scores = (1 + queries @ self.embeddings.T) / 2
+        reduce = np.maximum if self.aggregate == "max" else np.add
+        scores = reduce.reduceat(chunk_scores, self.chunk_offsets, axis=1)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        top = top_k_rows(scores, limit)
+        return [self._hits(top[q], scores[q, top[q]], cosine=False) for q in range(len(queries))]
+
+
+if __name__ == "__main__":
+    # Build a local index snapshot from the Steam_Embedding collection:
+    #   python vector_index.py <output_dir> [--quantization int8] [--chunked] [--metadata-format parquet]
+    import argparse
+
+    from pipeline import MongoDBConnection
+
+    parser = argparse.ArgumentParser(description="Build a local vector index snapshot")
+    parser.add_argument("output_dir", nargs="?", default="steam_index")
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default=None, help="Also write compact codes")
+    parser.add_argument("--chunked", action="store_true", help="Index embedding_chunks from Steam_Chunked")
+    parser.add_argument("--metadata-format", choices=METADATA_FORMATS, default="json",
+                        help="Game fields as metadata.json or as a typed metadata.parquet")
+    args = parser.parse_args()
+
+    mongo_conn = MongoDBConnection(mongo_access=os.environ.get("mongodb_access"))
+    if args.chunked:
+        index = ChunkedVectorIndex.from_collection(mongo_conn.db["Steam_Chunked"])
+    else:
+        index = LocalVectorIndex.from_collection(mongo_conn.collection)
+        if args.quantization:
+            index = QuantizedVectorIndex.from_index(index, mode=args.quantization)
+    index.save(args.output_dir, metadata_format=args.metadata_format)
+    print(f"Saved {index.embeddings.shape[0]} vectors ({index.dim}-dim) for {len(index)} games to {args.output_dir}")